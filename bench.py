@@ -0,0 +1,455 @@
+"""Benchmarks that need no hardware (POSIX only).
+
+Synthetic traffic is written to the master end of an os.openpty() pair and
+read from the slave end, which stands in for the device:
+
+    python bench.py framing --megabytes 16
+    python bench.py suite --json results.json
+
+framing compares each framer (plus its display formatting) with a bare
+os.read() loop. suite drives the real SerialSession reader (in-process
+and, with --path process, through the capture process ring) and, when a
+display is available, the Tk view (queue, flush, search) with short, long,
+binary and bursty traffic. It reports sustained lines/s and bytes/s,
+byte-to-display latency percentiles, Tk event-loop stalls and memory
+growth. --json writes the results as one JSON document ("-" for stdout) so
+runs can be compared over time.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import threading
+import time
+import tty
+
+from framing import make_framer, decode_line, hex_dump, cobs_encode, slip_encode
+
+READ_SIZE = 65536
+RESULTS_VERSION = 1
+
+# A marker line ends every segment of suite traffic; its write time is
+# recorded so the time until it is displayed gives the latency
+MARKER = "#L"
+SEGMENT_LINES = 64
+SCENARIOS = ("short", "long", "binary", "bursty")
+BURST_BYTES = 64 * 1024
+BURST_PAUSE = 0.02
+
+# Event-loop heartbeat used to measure Tk stalls
+HEARTBEAT_MS = 10
+SEARCH_STEPS = 200
+
+
+def synthetic_frames(count, seed=1):
+    """Return count random binary payloads of 8 to 256 bytes."""
+    generator = random.Random(seed)
+    return [generator.randbytes(generator.randint(8, 256)) for _ in range(count)]
+
+
+def encode_stream(framing, frames):
+    """Encode payloads into the byte stream a device using framing would send."""
+    name, _, argument = framing.partition(":")
+    if name == "lines":
+        return b"".join(f"t={index} v={len(frame)} {frame.hex()[:32]}\r\n".encode()
+                        for index, frame in enumerate(frames))
+    if name == "cobs":
+        return b"".join(cobs_encode(frame) + b"\0" for frame in frames)
+    if name == "slip":
+        return b"".join(slip_encode(frame) + b"\xc0" for frame in frames)
+    if name == "length":
+        return b"".join(len(frame).to_bytes(2, "little") + frame for frame in frames)
+    if name == "fixed":
+        return b"".join(frames)
+    raise ValueError(f"No encoder for framing: {framing}")
+
+
+def open_pty():
+    """Return (master, slave, slave path) of a raw pseudo-terminal pair."""
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    return master, slave, os.ttyname(slave)
+
+
+def write_all(fd, data):
+    view = memoryview(data)
+    position = 0
+    while position < len(data):
+        position += os.write(fd, view[position:position + READ_SIZE])
+
+
+def pty_read(stream, consume):
+    """Push stream through a pty and pass every chunk read to consume().
+
+    Returns the elapsed seconds from the first write to the last read.
+    """
+    master, slave, _ = open_pty()
+    total = len(stream)
+    writer = threading.Thread(target=write_all, args=(master, stream), daemon=True)
+    started = time.perf_counter()
+    writer.start()
+    received = 0
+    try:
+        while received < total:
+            data = os.read(slave, READ_SIZE)
+            received += len(data)
+            consume(data)
+        return time.perf_counter() - started
+    finally:
+        writer.join()
+        os.close(master)
+        os.close(slave)
+
+
+def bench_framing(megabytes):
+    """Compare each framer (with display formatting) against a raw pty read."""
+    frames = synthetic_frames(4096)
+    results = []
+    for framing in ("lines", "cobs", "slip", "length", "fixed:64"):
+        chunk = encode_stream(framing, frames)
+        stream = chunk * max(1, int(megabytes * 1024 * 1024 / len(chunk)))
+
+        baseline = pty_read(stream, lambda data: None)
+
+        framer = make_framer(framing)
+        counts = [0, 0]
+
+        def consume(data):
+            decoded = framer.feed(data)
+            if framer.binary:
+                rows = [row for frame in decoded for row in hex_dump(frame)]
+            else:
+                rows = [text for text in map(decode_line, decoded) if text]
+            counts[0] += len(decoded)
+            counts[1] += len(rows)
+
+        elapsed = pty_read(stream, consume)
+        results.append({
+            "benchmark": "framing",
+            "framing": framing,
+            "bytes": len(stream),
+            "raw_bytes_per_s": len(stream) / baseline,
+            "bytes_per_s": len(stream) / elapsed,
+            "frames_per_s": counts[0] / elapsed,
+            "rows_per_s": counts[1] / elapsed,
+            "errors": framer.errors,
+        })
+    return results
+
+
+def print_framing(results):
+    print(f"{'framing':<10} {'raw MB/s':>10} {'framed MB/s':>12} {'frames/s':>12} {'rows/s':>12} {'errors':>7}")
+    for result in results:
+        print(f"{result['framing']:<10} {result['raw_bytes_per_s'] / 1e6:>10.1f} "
+              f"{result['bytes_per_s'] / 1e6:>12.1f} {result['frames_per_s']:>12.0f} "
+              f"{result['rows_per_s']:>12.0f} {result['errors']:>7}")
+
+
+def scenario_segments(scenario, megabytes, seed=1):
+    """Return the traffic of a scenario as segments, each ending with a marker line.
+
+    Returns (segments, line_count); segments are (lines, marker line) bytes.
+    """
+    generator = random.Random(seed)
+    if scenario in ("short", "bursty"):
+        def make_line(index):
+            return f"I ({index}) sensor: t={index} v={generator.random():.3f}\r\n".encode()
+    elif scenario == "long":
+        def make_line(index):
+            return (f"D ({index}) dump: " + "x" * generator.randint(1000, 2000) + "\r\n").encode()
+    elif scenario == "binary":
+        def make_line(index):
+            # Not valid UTF-8, so every line takes the hex fallback path
+            data = generator.randbytes(generator.randint(16, 64)).replace(b"\n", b"\xff")
+            return b"\xff" + data + b"\n"
+    else:
+        raise ValueError(f"Unknown scenario: {scenario}")
+
+    budget = megabytes * 1024 * 1024
+    segments = []
+    size = 0
+    lines = 0
+    while size < budget:
+        segment = b"".join(make_line(lines + index) for index in range(SEGMENT_LINES))
+        marker = f"{MARKER}{len(segments)}\n".encode()
+        segments.append((segment, marker))
+        size += len(segment) + len(marker)
+        lines += SEGMENT_LINES + 1
+    return segments, lines
+
+
+def feed_segments(master, segments, written, bursty=False):
+    """Write segments to the pty master, recording when each marker was written."""
+    burst = 0
+    for number, (segment, marker) in enumerate(segments):
+        write_all(master, segment)
+        # Timestamp before the marker is written so it can never be seen earlier
+        written[number] = time.perf_counter()
+        write_all(master, marker)
+        if bursty:
+            burst += len(segment) + len(marker)
+            if burst >= BURST_BYTES:
+                burst = 0
+                time.sleep(BURST_PAUSE)
+
+
+def percentiles(samples, scale=1000.0):
+    """Return p50/p90/p99/max of samples (seconds) in milliseconds, or None."""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    last = len(ordered) - 1
+    return {
+        "p50": ordered[last * 50 // 100] * scale,
+        "p90": ordered[last * 90 // 100] * scale,
+        "p99": ordered[last * 99 // 100] * scale,
+        "max": ordered[last] * scale,
+    }
+
+
+def rss_kb():
+    """Return the current resident set size in KiB (peak size where unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+class MarkerClock:
+    """Collects marker arrival latencies from displayed lines."""
+
+    def __init__(self, count):
+        self.written = [0.0] * count
+        self.latencies = []
+        self.lines = 0
+        self.last = -1
+        self.done = threading.Event()
+
+    def seen(self, texts):
+        now = time.perf_counter()
+        self.lines += len(texts)
+        for text in texts:
+            if text.startswith(MARKER):
+                number = int(text[len(MARKER):])
+                self.latencies.append(max(now - self.written[number], 0.0))
+                self.last = number
+                if number == len(self.written) - 1:
+                    self.done.set()
+
+
+def scenario_result(path, scenario, clock, elapsed, stream_bytes, rss_before, **extra):
+    result = {
+        "benchmark": "suite",
+        "path": path,
+        "scenario": scenario,
+        "lines": clock.lines,
+        "bytes": stream_bytes,
+        "seconds": elapsed,
+        "lines_per_s": clock.lines / elapsed if elapsed else 0.0,
+        "bytes_per_s": stream_bytes / elapsed if elapsed else 0.0,
+        "latency_ms": percentiles(clock.latencies),
+        "complete": clock.done.is_set(),
+        "rss_growth_kb": rss_kb() - rss_before,
+    }
+    result.update(extra)
+    return result
+
+
+def bench_session(scenario, megabytes, timeout, collect_metrics=False, capture_process=False):
+    """Drive the SerialSession reader and decoder with one scenario."""
+    from metrics import Metrics
+    from session import SerialSession
+
+    segments, _ = scenario_segments(scenario, megabytes)
+    stream_bytes = sum(len(segment) + len(marker) for segment, marker in segments)
+    clock = MarkerClock(len(segments))
+    master, slave, path = open_pty()
+    session = SerialSession()
+    session.capture_process = capture_process
+    session.on_lines = lambda messages: clock.seen([text for text, message_type in messages])
+    session.on_message = lambda text, message_type: None
+    if collect_metrics:
+        session.set_metrics(Metrics(scenario))
+    rss_before = rss_kb()
+    try:
+        session.open(path, 115200)
+        started = time.perf_counter()
+        feed_segments(master, segments, clock.written, bursty=scenario == "bursty")
+        clock.done.wait(timeout)
+        elapsed = time.perf_counter() - started
+    finally:
+        session.shutdown()
+        os.close(master)
+        os.close(slave)
+    return scenario_result("process" if capture_process else "session", scenario, clock, elapsed, stream_bytes, rss_before,
+                           metrics=session.metrics.snapshot() if collect_metrics else None)
+
+
+def bench_gui(scenario, megabytes, timeout, collect_metrics=False):
+    """Drive the Tk view (queue, batched flush, scrollback, search) with one scenario."""
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+    except Exception as e:
+        return {"benchmark": "suite", "path": "gui", "scenario": scenario,
+                "skipped": f"Tk unavailable: {str(e)}"}
+    import gui
+
+    root.geometry("800x600")
+    view = gui.SerialChatGUI(root)
+    if collect_metrics:
+        view.metrics_enabled.set(True)
+        view.toggle_metrics()
+    segments, _ = scenario_segments(scenario, megabytes)
+    stream_bytes = sum(len(segment) + len(marker) for segment, marker in segments)
+    clock = MarkerClock(len(segments))
+
+    # Latency is taken when lines reach the display, i.e. the scrollback mirror
+    prefix_length = len(gui.MESSAGE_PREFIXES["received"])
+    append = view.scrollback.append
+
+    def displayed(lines):
+        clock.seen([line[prefix_length:] for line in lines])
+        append(lines)
+
+    view.scrollback.append = displayed
+
+    stalls = []
+    last_tick = [time.perf_counter()]
+
+    def heartbeat():
+        now = time.perf_counter()
+        stalls.append(max(now - last_tick[0] - HEARTBEAT_MS / 1000, 0.0))
+        last_tick[0] = now
+        root.after(HEARTBEAT_MS, heartbeat)
+
+    master, slave, path = open_pty()
+    rss_before = rss_kb()
+    started = time.perf_counter()
+    deadline = started + timeout
+    finished = []
+
+    def check_done():
+        if clock.done.is_set() or time.perf_counter() > deadline:
+            finished.append(time.perf_counter())
+            root.quit()
+        else:
+            root.after(50, check_done)
+
+    try:
+        view.port_var.set(path)
+        view.connect()
+        feeder = threading.Thread(target=feed_segments, daemon=True,
+                                  args=(master, segments, clock.written, scenario == "bursty"))
+        root.after(HEARTBEAT_MS, heartbeat)
+        root.after(50, check_done)
+        started = time.perf_counter()
+        feeder.start()
+        root.mainloop()
+        elapsed = finished[0] - started
+
+        # Index the scrollback for a frequent term, then step through the hits
+        view.search_var.set(MARKER)
+        search_started = time.perf_counter()
+        view.search_next()
+        search_first = time.perf_counter() - search_started
+        search_started = time.perf_counter()
+        for _ in range(SEARCH_STEPS):
+            view.search_next()
+        search_step = (time.perf_counter() - search_started) / SEARCH_STEPS
+        metrics_snapshot = view.session.metrics.snapshot() if collect_metrics else None
+    finally:
+        view.on_closing()
+        os.close(master)
+        os.close(slave)
+    return scenario_result("gui", scenario, clock, elapsed, stream_bytes, rss_before,
+                           stall_ms=percentiles(stalls),
+                           search_first_ms=search_first * 1000,
+                           search_next_ms=search_step * 1000,
+                           dropped_lines=view.dropped_lines,
+                           metrics=metrics_snapshot)
+
+
+def bench_suite(scenarios, paths, megabytes, timeout, collect_metrics=False):
+    results = []
+    for scenario in scenarios:
+        if "session" in paths:
+            results.append(bench_session(scenario, megabytes, timeout, collect_metrics))
+        if "process" in paths:
+            results.append(bench_session(scenario, megabytes, timeout, collect_metrics,
+                                         capture_process=True))
+        if "gui" in paths:
+            results.append(bench_gui(scenario, megabytes, timeout, collect_metrics))
+    return results
+
+
+def print_suite(results):
+    print(f"{'path':<8} {'scenario':<8} {'lines/s':>10} {'MB/s':>7} {'lat p50':>8} "
+          f"{'lat p99':>8} {'stall max':>10} {'rss +KiB':>9}")
+    for result in results:
+        if "skipped" in result:
+            print(f"{result['path']:<8} {result['scenario']:<8} skipped: {result['skipped']}")
+            continue
+        latency = result["latency_ms"] or {}
+        stall = result.get("stall_ms")
+        stall_max = f"{stall['max']:.1f}" if stall else "-"
+        print(f"{result['path']:<8} {result['scenario']:<8} {result['lines_per_s']:>10.0f} "
+              f"{result['bytes_per_s'] / 1e6:>7.1f} {latency.get('p50', 0):>8.1f} "
+              f"{latency.get('p99', 0):>8.1f} {stall_max:>10} "
+              f"{result['rss_growth_kb']:>9}" + ("" if result["complete"] else "  (timed out)"))
+
+
+def write_json(results, target):
+    """Write results with the run's environment as one JSON document."""
+    document = {
+        "version": RESULTS_VERSION,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if target == "-":
+        json.dump(document, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        with open(target, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serial monitor benchmarks over a pseudo-terminal.")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+    framing = subparsers.add_parser("framing", help="framer and hex dump throughput vs. raw reads")
+    framing.add_argument("--megabytes", type=float, default=16, help="data per framer (default: 16)")
+    framing.add_argument("--json", metavar="FILE", help="also write results as JSON ('-' for stdout)")
+    suite = subparsers.add_parser("suite", help="reader and display throughput, latency and stalls")
+    suite.add_argument("--scenario", action="append", choices=SCENARIOS,
+                       help="traffic to run (repeatable; default: all)")
+    suite.add_argument("--path", action="append", choices=("session", "process", "gui"),
+                       help="code path to drive (repeatable; default: session and gui)")
+    suite.add_argument("--megabytes", type=float, default=4, help="data per scenario (default: 4)")
+    suite.add_argument("--timeout", type=float, default=60, help="seconds per scenario (default: 60)")
+    suite.add_argument("--metrics", action="store_true",
+                       help="run with instrumentation on (to measure its overhead)")
+    suite.add_argument("--json", metavar="FILE", help="also write results as JSON ('-' for stdout)")
+    args = parser.parse_args()
+
+    if args.benchmark == "framing":
+        results = bench_framing(args.megabytes)
+        if args.json != "-":
+            print_framing(results)
+    else:
+        results = bench_suite(args.scenario or SCENARIOS, args.path or ("session", "gui"),
+                              args.megabytes, args.timeout, args.metrics)
+        if args.json != "-":
+            print_suite(results)
+    if args.json:
+        write_json(results, args.json)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""Raw session capture to compact, framed binary files.
+
+A capture file starts with a header followed by one record per chunk:
+
+    header:  magic b"SCAP", version (u16), reserved (u16),
+             start wall-clock time (f64, epoch seconds), start monotonic time (u64 ns)
+    record:  timestamp (u64 ns since start), direction (u8), length (u32), payload
+
+All integers are little-endian. A sidecar ".idx" file holds a sparse index
+of (timestamp, file offset) pairs pointing at record boundaries, written
+every INDEX_INTERVAL bytes of capture data.
+"""
+import os
+import struct
+import threading
+import time
+from bisect import bisect_right
+
+CAPTURE_DIR = os.path.join(os.path.expanduser("~"), ".serial_chat", "captures")
+CAPTURE_MAGIC = b"SCAP"
+CAPTURE_VERSION = 1
+CAPTURE_SUFFIX = ".scap"
+INDEX_SUFFIX = ".idx"
+
+HEADER = struct.Struct("<4sHHdQ")
+RECORD = struct.Struct("<QBI")
+INDEX_ENTRY = struct.Struct("<QQ")
+
+RX = 0
+TX = 1
+
+CAPTURE_BUFFER_SIZE = 1024 * 1024
+CAPTURE_MAX_BYTES = 512 * 1024 * 1024  # Rotate to a new file beyond this size
+INDEX_INTERVAL = 256 * 1024
+FSYNC_INTERVAL = 2.0
+
+
+class CaptureWriter:
+    """Append timestamped rx/tx chunks to rotating capture files.
+    
+    write() is called directly from the reader and writer threads and only
+    touches an in-memory buffer; a background thread flushes and fsyncs
+    the file every FSYNC_INTERVAL seconds.
+    
+    A disk error (e.g. ENOSPC, or a rotation that cannot open the next file)
+    never reaches the caller: the capture closes itself, keeps the exception
+    in error and calls on_error(capture) from the thread that hit it.
+    """
+    
+    def __init__(self, base_path, max_bytes=CAPTURE_MAX_BYTES):
+        self.base_path = base_path
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.sequence = 0
+        self.file = None
+        self.index_file = None
+        self.paths = []
+        self.bytes_written = 0
+        self.closed = False
+        self.error = None
+        self.on_error = None
+        try:
+            self.open_next()
+        except OSError:
+            self.close_files()
+            raise
+        self.flush_event = threading.Event()
+        self.flush_thread = threading.Thread(target=self.flush_loop, daemon=True)
+        self.flush_thread.start()
+    
+    @classmethod
+    def create(cls, directory=CAPTURE_DIR, prefix="capture"):
+        """Create a capture named after the current time in directory."""
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, time.strftime(f"{prefix}-%Y%m%d-%H%M%S"))
+        path = base
+        number = 1
+        while os.path.exists(path + CAPTURE_SUFFIX):
+            number += 1
+            path = f"{base}-{number}"
+        return cls(path)
+    
+    @property
+    def path(self):
+        """Path of the file currently being written."""
+        return self.paths[-1]
+    
+    def open_next(self):
+        """Close the current file (if any) and start the next one in the rotation."""
+        error = self.close_files()
+        if error:
+            raise error
+        suffix = f"-{self.sequence:04d}" if self.sequence else ""
+        path = f"{self.base_path}{suffix}{CAPTURE_SUFFIX}"
+        self.sequence += 1
+        self.file = open(path, "wb", buffering=CAPTURE_BUFFER_SIZE)
+        self.index_file = open(path + INDEX_SUFFIX, "wb")
+        self.start_ns = time.monotonic_ns()
+        self.file.write(HEADER.pack(CAPTURE_MAGIC, CAPTURE_VERSION, 0, time.time(), self.start_ns))
+        self.offset = HEADER.size
+        self.next_index = self.offset
+        self.paths.append(path)
+    
+    def write(self, direction, data):
+        """Append one chunk with the current monotonic timestamp."""
+        with self.lock:
+            if self.closed:
+                return
+            try:
+                if self.offset >= self.max_bytes:
+                    self.open_next()
+                timestamp = time.monotonic_ns()
+                if self.offset >= self.next_index:
+                    self.index_file.write(INDEX_ENTRY.pack(timestamp - self.start_ns, self.offset))
+                    self.next_index = self.offset + INDEX_INTERVAL
+                self.file.write(RECORD.pack(timestamp - self.start_ns, direction, len(data)))
+                self.file.write(data)
+                self.offset += RECORD.size + len(data)
+                self.bytes_written += len(data)
+                return
+            except OSError as e:
+                self.fail(e)
+        self.report_error()
+    
+    def flush_loop(self):
+        """Periodically push buffered data to disk without holding up writers."""
+        while not self.flush_event.wait(FSYNC_INTERVAL):
+            with self.lock:
+                if self.closed:
+                    return
+                try:
+                    self.file.flush()
+                    self.index_file.flush()
+                    # fsync duplicated descriptors outside the lock so a slow disk
+                    # never stalls the reader, even if the file rotates meanwhile
+                    fds = [os.dup(self.file.fileno()), os.dup(self.index_file.fileno())]
+                except OSError as e:
+                    self.fail(e)
+                    fds = None
+            if fds is None:
+                self.report_error()
+                return
+            for fd in fds:
+                try:
+                    os.fsync(fd)
+                except OSError:
+                    pass
+                os.close(fd)
+    
+    def close_files(self):
+        """Close both files; return the first error instead of leaking the other file."""
+        error = None
+        for f in (self.file, self.index_file):
+            if f:
+                try:
+                    f.close()
+                except OSError as e:
+                    error = error or e
+        self.file = None
+        self.index_file = None
+        return error
+    
+    def fail(self, error):
+        """Stop capturing after a disk error (called with the lock held)."""
+        self.closed = True
+        self.error = error
+        self.close_files()
+        self.flush_event.set()
+    
+    def report_error(self):
+        if self.on_error:
+            self.on_error(self)
+    
+    def close(self):
+        """Flush and close the capture."""
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.error = self.close_files()
+        self.flush_event.set()
+
+
+class CaptureReader:
+    """Read records back from a capture file, seeking with its sparse index."""
+    
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb", buffering=CAPTURE_BUFFER_SIZE)
+        header = self.file.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise ValueError(f"{path}: truncated capture header")
+        magic, version, reserved, self.start_wall, self.start_ns = HEADER.unpack(header)
+        if magic != CAPTURE_MAGIC or version != CAPTURE_VERSION:
+            raise ValueError(f"{path}: not a version {CAPTURE_VERSION} capture file")
+        self.index = self.load_index()
+        self.index_times = [timestamp for timestamp, offset in self.index]
+    
+    def load_index(self):
+        """Return the list of (timestamp, offset) entries from the sidecar index."""
+        try:
+            with open(self.path + INDEX_SUFFIX, "rb") as f:
+                data = f.read()
+        except OSError:
+            return [(0, HEADER.size)]
+        usable = len(data) - len(data) % INDEX_ENTRY.size
+        return [(0, HEADER.size)] + list(INDEX_ENTRY.iter_unpack(data[:usable]))
+    
+    def seek_time(self, seconds):
+        """Position the reader at the last indexed record at or before seconds.
+        
+        Records before the requested time may still follow; callers skip
+        them by timestamp.
+        """
+        position = bisect_right(self.index_times, int(seconds * 1e9))
+        self.file.seek(self.index[position - 1][1] if position else HEADER.size)
+    
+    def records(self):
+        """Yield (timestamp_ns, direction, data) from the current position.
+        
+        A record cut short at the end of the file (e.g. a capture that is
+        still being written) ends the iteration.
+        """
+        read = self.file.read
+        while True:
+            header = read(RECORD.size)
+            if len(header) < RECORD.size:
+                return
+            timestamp, direction, length = RECORD.unpack(header)
+            data = read(length)
+            if len(data) < length:
+                return
+            yield timestamp, direction, data
+    
+    def close(self):
+        self.file.close()
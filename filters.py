@@ -0,0 +1,183 @@
+"""User-defined include, exclude and highlight rules for received lines.
+
+Rules are written one per line:
+
+    exclude /^wait$/i
+    include ERROR
+    highlight:orange /W\\d{3}/
+
+The action is include, exclude or highlight (optionally followed by
+:color). The pattern is literal text, or a regular expression between
+slashes with an optional trailing i for case-insensitive matching. Blank
+lines and lines starting with # are ignored.
+
+All rules are compiled into one combined alternation that is run over a
+whole received chunk at once, so the common case (no rule touches the
+chunk) costs a single scan. Only lines it flags are then checked against
+each rule individually, so overlapping rules are all counted whatever
+their order. Rules that look beyond their own line (\\A, \\Z, lookarounds,
+or inline flags switching MULTILINE off) could miss in the joined chunk,
+so with any of them the combined pattern is run line by line instead.
+"""
+import re
+import time
+
+ACTIONS = ("include", "exclude", "highlight")
+DEFAULT_HIGHLIGHT = "yellow"
+HIGHLIGHT_PREFIX = "hl:"  # Message types of highlighted received lines
+
+# Built-in rule behind the "Filter 'wait' messages" option
+WAIT_RULE_SOURCE = "exclude /^wait$/i"
+
+# Regex constructs whose result can change when a line is scanned inside
+# the joined chunk rather than on its own
+LINE_SENSITIVE = re.compile(r"\\[AZz]|\(\?<?[=!]|\(\?[a-zA-Z]*-")
+
+
+class FilterRule:
+    """One parsed rule."""
+
+    def __init__(self, action, pattern, regex=False, ignore_case=False, color=None, source=None):
+        if action not in ACTIONS:
+            raise ValueError(f"Unknown rule action: {action}")
+        self.action = action
+        self.pattern = pattern
+        self.regex = regex
+        self.ignore_case = ignore_case
+        self.color = color or (DEFAULT_HIGHLIGHT if action == "highlight" else None)
+        self.source = source or pattern
+
+    def expression(self):
+        """Return this rule's pattern as a regular expression fragment."""
+        expression = self.pattern if self.regex else re.escape(self.pattern)
+        return f"(?i:{expression})" if self.ignore_case else expression
+
+
+def parse_pattern(pattern):
+    """Split literal text or /regex/ or /regex/i into (pattern, regex, ignore_case)."""
+    if len(pattern) > 1 and pattern.startswith("/"):
+        if pattern.endswith("/i") and len(pattern) > 2:
+            return pattern[1:-2], True, True
+        if pattern.endswith("/"):
+            return pattern[1:-1], True, False
+    return pattern, False, False
+
+
+def parse_rule(line):
+    """Parse one rule line; raises ValueError if it is malformed."""
+    action, _, pattern = line.strip().partition(" ")
+    action, _, color = action.partition(":")
+    pattern = pattern.strip()
+    if not pattern:
+        raise ValueError(f"Rule has no pattern: {line.strip()}")
+    pattern, regex, ignore_case = parse_pattern(pattern)
+    return FilterRule(action.lower(), pattern, regex, ignore_case, color or None, line.strip())
+
+
+def parse_rules(text):
+    """Parse a block of rule lines; errors name the offending line."""
+    rules = []
+    for number, line in enumerate(text.splitlines(), 1):
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        try:
+            rules.append(parse_rule(line))
+        except ValueError as e:
+            raise ValueError(f"Line {number}: {str(e)}") from None
+    return rules
+
+
+class RuleCounters:
+    """Hit counts and totals shared by the successive RuleSets of one session.
+
+    Only the reader thread updates them, so a RuleSet that is swapped out
+    while it is still filtering a chunk counts into the same place as the
+    one replacing it.
+    """
+
+    def __init__(self):
+        self.hits = {}  # Rule source -> matching lines
+        self.lines_seen = 0
+        self.lines_dropped = 0
+        self.time_ns = 0
+
+
+class RuleSet:
+    """An immutable compiled set of rules, counting into a RuleCounters.
+
+    Sessions swap in a new RuleSet to change rules, so the reader never
+    sees a half-updated rule list; passing the old set's counters keeps the
+    counts across the swap.
+    """
+
+    def __init__(self, rules, counters=None):
+        self.rules = list(rules)
+        self.counters = counters or RuleCounters()
+        self.sources = [rule.source for rule in self.rules]
+        for source in self.sources:
+            self.counters.hits.setdefault(source, 0)
+        self.has_include = any(rule.action == "include" for rule in self.rules)
+        # The joined-chunk pre-scan is only exact when no rule looks past its line
+        self.scan_joined = not self.has_include and not any(
+            rule.regex and LINE_SENSITIVE.search(rule.pattern) for rule in self.rules)
+        self.pattern = None
+        self.searches = []
+        if self.rules:
+            try:
+                self.pattern = re.compile(
+                    "|".join(f"(?:{rule.expression()})" for rule in self.rules), re.MULTILINE)
+                self.searches = [(index, re.compile(rule.expression(), re.MULTILINE).search)
+                                 for index, rule in enumerate(self.rules)]
+            except re.error as e:
+                raise ValueError(f"Invalid rule pattern: {str(e)}") from None
+
+    def __bool__(self):
+        return bool(self.rules)
+
+    def apply(self, texts, message_type="received"):
+        """Filter decoded lines and return the kept (text, message_type) pairs.
+
+        Highlighted lines get a message type of HIGHLIGHT_PREFIX + color.
+        """
+        if self.pattern is None:
+            return [(text, message_type) for text in texts]
+        started = time.perf_counter_ns()
+        counters = self.counters
+        counters.lines_seen += len(texts)
+
+        # Fast path: one scan over the whole chunk when no rule can apply
+        if self.scan_joined and not self.pattern.search("\n".join(texts)):
+            counters.time_ns += time.perf_counter_ns() - started
+            return [(text, message_type) for text in texts]
+
+        search = self.pattern.search
+        searches = self.searches
+        rules = self.rules
+        sources = self.sources
+        hits = counters.hits
+        kept = []
+        for text in texts:
+            if not search(text):
+                if not self.has_include:
+                    kept.append((text, message_type))
+                continue
+            matched = [index for index, rule_search in searches if rule_search(text)]
+            for index in matched:
+                hits[sources[index]] += 1
+            if any(rules[index].action == "exclude" for index in matched):
+                continue
+            if self.has_include and not any(rules[index].action == "include" for index in matched):
+                continue
+            highlights = [index for index in matched if rules[index].action == "highlight"]
+            if highlights:
+                kept.append((text, HIGHLIGHT_PREFIX + rules[highlights[0]].color))
+            else:
+                kept.append((text, message_type))
+        counters.lines_dropped += len(texts) - len(kept)
+        counters.time_ns += time.perf_counter_ns() - started
+        return kept
+
+    def stats(self):
+        """Return (rule source, hits) pairs for display."""
+        hits = self.counters.hits
+        return [(source, hits[source]) for source in self.sources]
@@ -0,0 +1,290 @@
+"""Byte-stream framing helpers used by the serial reader.
+
+A framer turns the raw chunks read from the port into complete frames:
+
+    feed(data)   append a chunk, return the list of frames it completed
+    flush()      return and clear any buffered partial frame
+    binary       True if frames are shown as a hex dump rather than text
+    errors       count of malformed or oversized frames
+
+LineFramer also has partial(), which returns the unterminated line it is
+holding (e.g. a "> " prompt) without consuming it.
+
+Frames are scanned through a memoryview of the framer's receive buffer and
+only copied once, when a finished frame is handed out. New framers are
+added to FRAMERS and selected with make_framer("name[:arg[:arg]]").
+"""
+
+# A partial line longer than this is emitted as-is so a stream that never
+# sends a newline cannot grow the carry-over buffer without bound.
+MAX_LINE_BYTES = 4096
+
+# The same bound for binary frames that never see their delimiter
+MAX_FRAME_BYTES = 65536
+
+HEX_DUMP_WIDTH = 16
+
+# Printable ASCII maps to itself, everything else to '.'
+ASCII_TABLE = bytes(byte if 0x20 <= byte < 0x7F else 0x2E for byte in range(256))
+
+
+class LineFramer:
+    """Split a byte stream into newline-terminated lines, carrying partial lines over."""
+
+    binary = False
+
+    def __init__(self, max_line=MAX_LINE_BYTES):
+        self.max_line = max_line
+        self.buffer = bytearray()
+        self.errors = 0
+
+    def feed(self, data):
+        """Append a chunk and return the list of complete lines it finished."""
+        buffer = self.buffer
+        buffer += data
+        end = buffer.rfind(b"\n")
+        if end < 0:
+            if len(buffer) < self.max_line:
+                return []
+            line = bytes(buffer)
+            buffer.clear()
+            return [line]
+
+        # One copy through a view; slicing the bytearray would copy twice
+        with memoryview(buffer) as view:
+            lines = bytes(view[:end]).split(b"\n")
+        del buffer[:end + 1]
+        if len(buffer) >= self.max_line:
+            lines.append(bytes(buffer))
+            buffer.clear()
+        return lines
+
+    def partial(self):
+        """Return the buffered partial line, leaving it in place."""
+        return bytes(self.buffer)
+
+    def flush(self):
+        """Return and clear any buffered partial line."""
+        line = bytes(self.buffer)
+        self.buffer.clear()
+        return line
+
+
+class BinaryFramer:
+    """Base class for binary framers: buffering around a split() scan.
+
+    Subclasses implement split(view) returning (frames, consumed) for a
+    memoryview of the buffered bytes; consumed bytes are then dropped.
+    """
+
+    binary = True
+
+    def __init__(self, max_frame=MAX_FRAME_BYTES):
+        self.max_frame = max_frame
+        self.buffer = bytearray()
+        self.errors = 0
+
+    def feed(self, data):
+        """Append a chunk and return the list of complete frames it finished."""
+        buffer = self.buffer
+        buffer += data
+        # The view must be released before the buffer is resized
+        with memoryview(buffer) as view:
+            frames, consumed = self.split(view)
+        if consumed:
+            del buffer[:consumed]
+        if len(buffer) >= self.max_frame:
+            # Delimiter or length lost: hand the bytes out raw and resync
+            self.errors += 1
+            frames.append(bytes(buffer))
+            buffer.clear()
+        return frames
+
+    def flush(self):
+        """Return and clear any buffered partial frame."""
+        frame = bytes(self.buffer)
+        self.buffer.clear()
+        return frame
+
+    def split(self, view):
+        raise NotImplementedError
+
+
+class DelimitedFramer(BinaryFramer):
+    """Frames terminated by a delimiter byte, decoded by unstuff()."""
+
+    delimiter = 0
+
+    def split(self, view):
+        buffer = self.buffer
+        delimiter = self.delimiter
+        frames = []
+        start = 0
+        while True:
+            end = buffer.find(delimiter, start)
+            if end < 0:
+                return frames, start
+            if end > start:  # Back-to-back delimiters carry no frame
+                frame = view[start:end]
+                try:
+                    frames.append(self.unstuff(frame))
+                except ValueError:
+                    self.errors += 1
+                    frames.append(bytes(frame))
+            start = end + 1
+
+    def unstuff(self, frame):
+        return bytes(frame)
+
+
+class CobsFramer(DelimitedFramer):
+    """Consistent Overhead Byte Stuffing frames delimited by 0x00."""
+
+    delimiter = 0
+
+    def unstuff(self, frame):
+        """Decode one COBS frame (without its delimiter); raises ValueError if invalid."""
+        decoded = bytearray()
+        length = len(frame)
+        position = 0
+        while position < length:
+            code = frame[position]
+            end = position + code
+            if code == 0 or end > length:
+                raise ValueError("Invalid COBS frame")
+            decoded += frame[position + 1:end]
+            if code < 0xFF and end < length:
+                decoded.append(0)
+            position = end
+        return decoded
+
+
+class SlipFramer(DelimitedFramer):
+    """SLIP (RFC 1055) frames delimited by 0xC0."""
+
+    delimiter = 0xC0
+
+    def unstuff(self, frame):
+        data = bytes(frame)
+        if b"\xdb" not in data:
+            return data
+        # ESC ESC_END before ESC ESC_ESC so an escaped ESC is not re-read
+        return data.replace(b"\xdb\xdc", b"\xc0").replace(b"\xdb\xdd", b"\xdb")
+
+
+class LengthPrefixFramer(BinaryFramer):
+    """Frames preceded by a size-byte unsigned payload length."""
+
+    def __init__(self, size=2, byteorder="little", max_frame=MAX_FRAME_BYTES):
+        super().__init__(max_frame)
+        if size not in (1, 2, 4):
+            raise ValueError("Length prefix must be 1, 2 or 4 bytes")
+        if byteorder not in ("little", "big"):
+            raise ValueError("Byte order must be 'little' or 'big'")
+        self.size = size
+        self.byteorder = byteorder
+
+    def split(self, view):
+        size = self.size
+        available = len(view)
+        frames = []
+        start = 0
+        while available - start >= size:
+            length = int.from_bytes(view[start:start + size], self.byteorder)
+            if size + length > self.max_frame:
+                # Implausible length: skip a byte and try to resync
+                self.errors += 1
+                start += 1
+                continue
+            end = start + size + length
+            if end > available:
+                break
+            frames.append(bytes(view[start + size:end]))
+            start = end
+        return frames, start
+
+
+class FixedFramer(BinaryFramer):
+    """Frames of a fixed number of bytes."""
+
+    def __init__(self, size=16, max_frame=MAX_FRAME_BYTES):
+        if size < 1:
+            raise ValueError("Frame size must be at least 1 byte")
+        super().__init__(max(max_frame, size))
+        self.size = size
+
+    def split(self, view):
+        size = self.size
+        count = len(view) // size
+        return [bytes(view[index * size:(index + 1) * size]) for index in range(count)], count * size
+
+
+# Framer name -> factory taking the optional ":"-separated arguments as strings
+FRAMERS = {
+    "lines": lambda max_line=str(MAX_LINE_BYTES): LineFramer(int(max_line)),
+    "cobs": CobsFramer,
+    "slip": SlipFramer,
+    "length": lambda size="2", byteorder="little": LengthPrefixFramer(int(size), byteorder),
+    "fixed": lambda size="16": FixedFramer(int(size)),
+}
+
+
+def make_framer(spec="lines"):
+    """Create a framer from "name[:arg...]", e.g. "cobs", "length:4:big" or "fixed:32".
+
+    Raises ValueError for an unknown name or bad arguments.
+    """
+    name, *arguments = (spec or "lines").strip().split(":")
+    factory = FRAMERS.get(name.lower())
+    if factory is None:
+        raise ValueError(f"Unknown framing: {name} (choose from {', '.join(FRAMERS)})")
+    try:
+        return factory(*arguments)
+    except TypeError:
+        raise ValueError(f"Too many arguments for framing: {spec}") from None
+    except ValueError as e:
+        raise ValueError(f"Invalid framing {spec}: {str(e)}") from None
+
+
+def cobs_encode(data):
+    """COBS-encode data (without the trailing 0x00 delimiter)."""
+    encoded = bytearray()
+    for block in bytes(data).split(b"\0"):
+        # Runs longer than 254 bytes are split into 0xFF blocks without a zero
+        while len(block) >= 0xFE:
+            encoded.append(0xFF)
+            encoded += block[:0xFE]
+            block = block[0xFE:]
+        encoded.append(len(block) + 1)
+        encoded += block
+    return bytes(encoded)
+
+
+def slip_encode(data):
+    """SLIP-escape data (without the trailing 0xC0 delimiter)."""
+    return bytes(data).replace(b"\xdb", b"\xdb\xdd").replace(b"\xc0", b"\xdb\xdc")
+
+
+def decode_line(data):
+    """Decode a received line as UTF-8, falling back to a hex representation."""
+    try:
+        return data.decode().strip()
+    except UnicodeDecodeError:
+        return f"[HEX] {data.hex(' ').upper()}"
+
+
+def hex_dump(data, width=HEX_DUMP_WIDTH):
+    """Format data as offset / hex / ASCII dump rows, one string per row.
+
+    The hex and ASCII columns are each formatted for the whole frame in one
+    call and then sliced into rows.
+    """
+    data = bytes(data)
+    if not data:
+        return []
+    digits = data.hex(" ").upper()
+    text = data.translate(ASCII_TABLE).decode("ascii")
+    column = width * 3 - 1
+    return [f"{offset:04X}  {digits[offset * 3:offset * 3 + column]:<{column}}  "
+            f"|{text[offset:offset + width]}|"
+            for offset in range(0, len(data), width)]
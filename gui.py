@@ -0,0 +1,1190 @@
+"""Tkinter front end: a thin view over a SerialSession."""
+import tkinter as tk
+from tkinter import ttk, filedialog
+import time
+import re
+import os
+from collections import deque
+
+from capture import CaptureWriter
+from filters import parse_rules, HIGHLIGHT_PREFIX
+from logviewer import LogViewer
+from metrics import Metrics, MetricsExporter, METRICS_DIR, format_snapshot
+from ports import PortWatcher, is_serial_device
+from reconnect import port_identity
+from script import ScriptRunner, parse_script
+from search import SearchIndex
+from session import SerialSession, ReaderPool, FLOW_CONTROL, parse_commands
+from upload import Upload, PROTOCOLS, DEFAULT_CHUNK_SIZE, DEFAULT_WINDOW
+from writer import DEFAULT_COMMAND_DELAY
+
+# Received lines are queued by the reader thread and applied to the chat
+# display in batches on a fixed frame timer.
+FLUSH_INTERVAL_MS = 40
+MAX_LINES_PER_FLUSH = 5000
+MAX_PENDING_LINES = 200000
+
+# Scrollback budget for the chat display. Once either limit is exceeded by
+# the trim slack the oldest lines are deleted in one bulk operation.
+DEFAULT_SCROLLBACK_LINES = 50000
+SCROLLBACK_MAX_BYTES = 32 * 1024 * 1024
+SCROLLBACK_TRIM_SLACK = 0.1
+
+# Framing presets offered in the GUI; any make_framer() spec can be typed
+FRAMING_CHOICES = ["lines", "cobs", "slip", "length:2", "length:2:big", "fixed:16"]
+
+HISTORY_DIR = os.path.join(os.path.expanduser("~"), ".serial_chat", "logs")
+
+MESSAGE_PREFIXES = {
+    "sent": "→ ",
+    "received": "← ",
+    "error": "! ",
+    "system": "* ",
+}
+MESSAGE_COLORS = {
+    "sent": "blue",
+    "received": "green",
+    "error": "red",
+    "system": "gray",
+}
+
+class Scrollback:
+    """Mirror of the lines held by the chat display, with bulk trimming."""
+    
+    def __init__(self, max_lines=DEFAULT_SCROLLBACK_LINES, max_bytes=SCROLLBACK_MAX_BYTES):
+        self.max_lines = max_lines
+        self.max_bytes = max_bytes
+        self.lines = deque()
+        self.total_bytes = 0
+        self.first = 0  # Absolute number of the oldest line still held
+    
+    def __len__(self):
+        return len(self.lines)
+    
+    @property
+    def end(self):
+        """Absolute number of the next line to be appended."""
+        return self.first + len(self.lines)
+    
+    def append(self, lines):
+        """Record lines that were appended to the display."""
+        self.lines.extend(lines)
+        self.total_bytes += sum(map(len, lines)) + len(lines)
+    
+    def trim(self):
+        """Drop the oldest lines once a budget is exceeded; return how many were removed."""
+        slack_lines = int(self.max_lines * SCROLLBACK_TRIM_SLACK)
+        slack_bytes = int(self.max_bytes * SCROLLBACK_TRIM_SLACK)
+        if (len(self.lines) <= self.max_lines + slack_lines and
+                self.total_bytes <= self.max_bytes + slack_bytes):
+            return 0
+        
+        lines = self.lines
+        count = 0
+        chars = 0
+        while lines and (len(lines) > self.max_lines or self.total_bytes - chars > self.max_bytes):
+            chars += len(lines.popleft()) + 1
+            count += 1
+        self.total_bytes -= chars
+        self.first += count
+        return count
+    
+    def clear(self):
+        """Forget all held lines while keeping absolute numbering monotonic."""
+        self.first = self.end
+        self.lines.clear()
+        self.total_bytes = 0
+
+class SerialChatGUI:
+    def __init__(self, root, parent=None, port_watcher=None, reader_pool=None,
+                 on_connection_change=None):
+        self.root = root
+        # A view embedded in a container (e.g. a notebook tab) shares the
+        # owner's port watcher and reader pool instead of running its own
+        self.standalone = parent is None
+        self.container = parent or root
+        if self.standalone:
+            self.root.title("Serial Chat")
+        self.on_connection_change = on_connection_change
+        
+        # Configure container to scale
+        self.container.columnconfigure(0, weight=1)
+        self.container.rowconfigure(0, weight=1)
+        
+        # Serial session (connection, reader, writer, reconnect)
+        self.port_watcher = port_watcher or PortWatcher(self.on_ports_changed)
+        self.session = SerialSession(self.port_watcher, reader_pool)
+        self.session.on_lines = self.queue_messages
+        self.session.on_message = self.add_message
+        self.session.on_state = lambda connected: self.root.after(0, self.update_connection_state)
+        
+        # Variables
+        self.command_history = deque(maxlen=100)
+        self.history_position = -1
+        self.running = True
+        self.search_index = SearchIndex()
+        self.highlight_pending = False
+        self.rules_source = ""
+        self.rules_window = None
+        self.plot = None
+        self.metrics_exporter = None
+        self.metrics_previous = None
+        self.script_runner = None
+        self.upload = None
+        self.log_viewers = []
+        self.highlight_tags = set()
+        
+        # Pending display queue (filled by the reader thread, drained by the GUI)
+        self.pending = deque(maxlen=MAX_PENDING_LINES)
+        self.dropped_lines = 0
+        self.flushed_lines = 0
+        self.rate_lines = 0
+        self.rate_started = time.monotonic()
+        
+        # Bounded scrollback; the full history goes to the on-disk log
+        self.scrollback = Scrollback()
+        self.history_file = None
+        
+        # Main container
+        main_frame = ttk.Frame(self.container)
+        main_frame.grid(row=0, column=0, sticky='nsew', padx=10, pady=10)
+        main_frame.columnconfigure(0, weight=1)
+        main_frame.rowconfigure(2, weight=1)  # Make chat area expandable
+        
+        # Top frame for controls
+        control_frame = ttk.Frame(main_frame)
+        control_frame.grid(row=0, column=0, sticky='ew', padx=5, pady=5)
+        control_frame.columnconfigure(0, weight=1)  # Make port combo expandable
+        
+        # Device selection with port info
+        self.port_var = tk.StringVar()
+        self.port_info = {}  # Immutable port snapshot published by the port watcher
+        self.port_combo = ttk.Combobox(control_frame, textvariable=self.port_var, width=50)
+        self.port_combo.grid(row=0, column=0, padx=5, sticky='ew')
+        self.port_combo.bind('<<ComboboxSelected>>', self.on_port_selected)
+        
+        # Baud rate
+        baud_frame = ttk.Frame(control_frame)
+        baud_frame.grid(row=0, column=1, padx=5)
+        ttk.Label(baud_frame, text="Baud Rate:").grid(row=0, column=0)
+        self.baud_var = tk.StringVar(value="115200")
+        baud_entry = ttk.Entry(baud_frame, textvariable=self.baud_var, width=10)
+        baud_entry.grid(row=0, column=1, padx=5)
+        
+        # Connect button
+        self.connect_button = ttk.Button(control_frame, text="Connect", command=self.toggle_connection)
+        self.connect_button.grid(row=0, column=2, padx=5)
+        
+        # Clear button
+        self.clear_button = ttk.Button(control_frame, text="Clear", command=self.clear_chat)
+        self.clear_button.grid(row=0, column=3, padx=5)
+        
+        # Filter checkbox
+        self.filter_wait = tk.BooleanVar()
+        self.filter_check = ttk.Checkbutton(control_frame, text="Filter 'wait' messages", 
+                                          variable=self.filter_wait, command=self.on_filter_toggled)
+        self.filter_check.grid(row=0, column=4, padx=5)
+        
+        # Search frame
+        search_frame = ttk.Frame(main_frame)
+        search_frame.grid(row=1, column=0, sticky='ew', padx=5, pady=5)
+        search_frame.columnconfigure(0, weight=1)  # Make search entry expandable
+        
+        # Search entry
+        self.search_var = tk.StringVar()
+        self.search_entry = ttk.Entry(search_frame, textvariable=self.search_var)
+        self.search_entry.grid(row=0, column=0, sticky='ew', padx=(0, 5))
+        
+        # Search buttons
+        self.search_prev_button = ttk.Button(search_frame, text="Prev", command=self.search_prev)
+        self.search_prev_button.grid(row=0, column=1)
+        self.search_button = ttk.Button(search_frame, text="Next", command=self.search_next)
+        self.search_button.grid(row=0, column=2, padx=(5, 0))
+        
+        # Search options
+        self.search_regex = tk.BooleanVar()
+        ttk.Checkbutton(search_frame, text="Regex", variable=self.search_regex).grid(row=0, column=3, padx=5)
+        self.search_case = tk.BooleanVar()
+        ttk.Checkbutton(search_frame, text="Match case", variable=self.search_case).grid(row=0, column=4)
+        
+        # Scrollback size and on-disk history
+        ttk.Label(search_frame, text="Scrollback lines:").grid(row=0, column=5, padx=(10, 0))
+        self.scrollback_var = tk.StringVar(value=str(DEFAULT_SCROLLBACK_LINES))
+        scrollback_entry = ttk.Entry(search_frame, textvariable=self.scrollback_var, width=8)
+        scrollback_entry.grid(row=0, column=6, padx=5)
+        self.scrollback_var.trace_add('write', lambda *args: self.update_scrollback_limit())
+        
+        self.log_to_file = tk.BooleanVar()
+        self.log_check = ttk.Checkbutton(search_frame, text="Log to file",
+                                         variable=self.log_to_file, command=self.toggle_history_log)
+        self.log_check.grid(row=0, column=7, padx=5)
+        
+        self.capture_raw = tk.BooleanVar()
+        self.capture_check = ttk.Checkbutton(search_frame, text="Capture raw",
+                                             variable=self.capture_raw, command=self.toggle_capture)
+        self.capture_check.grid(row=0, column=8, padx=5)
+        
+        # Search result label
+        self.search_label = ttk.Label(search_frame, text="")
+        self.search_label.grid(row=1, column=0, columnspan=9, pady=(2, 0))
+        
+        # Chat display area with frame
+        chat_frame = ttk.Frame(main_frame)
+        chat_frame.grid(row=2, column=0, sticky='nsew', pady=5)
+        chat_frame.columnconfigure(0, weight=1)
+        chat_frame.rowconfigure(0, weight=1)
+        
+        # Chat display
+        self.chat_text = tk.Text(chat_frame, wrap=tk.WORD)
+        self.chat_text.grid(row=0, column=0, sticky='nsew')
+        
+        # Scrollbar for chat
+        scrollbar = ttk.Scrollbar(chat_frame, orient=tk.VERTICAL, command=self.chat_text.yview)
+        scrollbar.grid(row=0, column=1, sticky='ns')
+        self.chat_scrollbar = scrollbar
+        self.chat_text.configure(yscrollcommand=self.on_chat_scroll)
+        for message_type, color in MESSAGE_COLORS.items():
+            self.chat_text.tag_configure(message_type, foreground=color)
+        self.chat_text.tag_configure("search_hit", background="yellow")
+        self.chat_text.tag_configure("search_current", background="orange")
+        self.chat_text.tag_raise("search_current", "search_hit")
+        
+        # Input frame
+        input_frame = ttk.Frame(main_frame)
+        input_frame.grid(row=3, column=0, sticky='ew', pady=(5, 0))
+        input_frame.columnconfigure(0, weight=1)  # Make message entry expandable
+        
+        # Message entry
+        self.message_var = tk.StringVar()
+        self.message_entry = ttk.Entry(input_frame, textvariable=self.message_var)
+        self.message_entry.grid(row=0, column=0, sticky='ew', padx=(0, 5))
+        
+        # Send button
+        self.send_button = ttk.Button(input_frame, text="Send", command=self.send_message)
+        self.send_button.grid(row=0, column=1)
+        
+        # Cancel button for queued sends
+        self.cancel_button = ttk.Button(input_frame, text="Cancel", command=self.cancel_sends)
+        self.cancel_button.grid(row=0, column=2, padx=(5, 0))
+        
+        # Stream a file to the device
+        self.upload_button = ttk.Button(input_frame, text="Upload...", command=self.toggle_upload)
+        self.upload_button.grid(row=0, column=3, padx=(5, 0))
+        
+        # Send pacing, flow control and receive framing
+        pacing_frame = ttk.Frame(input_frame)
+        pacing_frame.grid(row=1, column=0, columnspan=4, sticky='w', pady=(5, 0))
+        ttk.Label(pacing_frame, text="Delay (ms):").grid(row=0, column=0)
+        self.delay_var = tk.StringVar(value=str(int(DEFAULT_COMMAND_DELAY * 1000)))
+        ttk.Entry(pacing_frame, textvariable=self.delay_var, width=6).grid(row=0, column=1, padx=5)
+        ttk.Label(pacing_frame, text="Wait for prompt:").grid(row=0, column=2, padx=(10, 0))
+        self.prompt_var = tk.StringVar()
+        ttk.Entry(pacing_frame, textvariable=self.prompt_var, width=12).grid(row=0, column=3, padx=5)
+        ttk.Label(pacing_frame, text="Flow control:").grid(row=0, column=4, padx=(10, 0))
+        self.flow_var = tk.StringVar(value="None")
+        ttk.Combobox(pacing_frame, textvariable=self.flow_var, state='readonly', width=10,
+                     values=list(FLOW_CONTROL)).grid(row=0, column=5, padx=5)
+        ttk.Label(pacing_frame, text="Framing:").grid(row=0, column=6, padx=(10, 0))
+        self.framing_var = tk.StringVar(value="lines")
+        framing_combo = ttk.Combobox(pacing_frame, textvariable=self.framing_var, width=12,
+                                     values=FRAMING_CHOICES)
+        framing_combo.grid(row=0, column=7, padx=5)
+        framing_combo.bind('<<ComboboxSelected>>', lambda e: self.apply_framing())
+        framing_combo.bind('<Return>', lambda e: self.apply_framing())
+        self.hex_view = tk.BooleanVar()
+        ttk.Checkbutton(pacing_frame, text="Hex dump", variable=self.hex_view,
+                        command=self.apply_framing).grid(row=0, column=8, padx=5)
+        self.capture_process = tk.BooleanVar()
+        ttk.Checkbutton(pacing_frame, text="Capture process", variable=self.capture_process
+                        ).grid(row=0, column=9, padx=5)
+        
+        # Upload protocol and pacing
+        upload_frame = ttk.Frame(input_frame)
+        upload_frame.grid(row=2, column=0, columnspan=4, sticky='w', pady=(5, 0))
+        ttk.Label(upload_frame, text="Upload:").grid(row=0, column=0)
+        self.upload_protocol_var = tk.StringVar(value="raw")
+        ttk.Combobox(upload_frame, textvariable=self.upload_protocol_var, state='readonly', width=9,
+                     values=PROTOCOLS).grid(row=0, column=1, padx=5)
+        ttk.Label(upload_frame, text="Chunk:").grid(row=0, column=2, padx=(10, 0))
+        self.upload_chunk_var = tk.StringVar(value=str(DEFAULT_CHUNK_SIZE))
+        ttk.Entry(upload_frame, textvariable=self.upload_chunk_var, width=6).grid(row=0, column=3, padx=5)
+        ttk.Label(upload_frame, text="Window:").grid(row=0, column=4, padx=(10, 0))
+        self.upload_window_var = tk.StringVar(value=str(DEFAULT_WINDOW))
+        ttk.Entry(upload_frame, textvariable=self.upload_window_var, width=4).grid(row=0, column=5, padx=5)
+        ttk.Label(upload_frame, text="Ack pattern:").grid(row=0, column=6, padx=(10, 0))
+        self.upload_ack_var = tk.StringVar()
+        ttk.Entry(upload_frame, textvariable=self.upload_ack_var, width=12).grid(row=0, column=7, padx=5)
+        self.upload_lines = tk.BooleanVar()
+        ttk.Checkbutton(upload_frame, text="One line per chunk",
+                        variable=self.upload_lines).grid(row=0, column=8, padx=5)
+        
+        # Throughput / queue status
+        status_frame = ttk.Frame(main_frame)
+        status_frame.grid(row=4, column=0, sticky='ew', padx=5, pady=(2, 0))
+        status_frame.columnconfigure(0, weight=1)
+        self.status_label = ttk.Label(status_frame, text="", anchor='w')
+        self.status_label.grid(row=0, column=0, sticky='ew')
+        self.metrics_button = ttk.Button(status_frame, text="Metrics ▸", command=self.toggle_metrics_panel)
+        self.metrics_button.grid(row=0, column=1)
+        
+        # Collapsible instrumentation panel (hidden until expanded)
+        self.metrics_frame = ttk.Frame(main_frame)
+        self.metrics_frame.grid(row=5, column=0, sticky='ew', padx=5, pady=(2, 0))
+        self.metrics_frame.columnconfigure(5, weight=1)
+        self.metrics_enabled = tk.BooleanVar()
+        ttk.Checkbutton(self.metrics_frame, text="Collect metrics", variable=self.metrics_enabled,
+                        command=self.toggle_metrics).grid(row=0, column=0)
+        self.metrics_to_file = tk.BooleanVar()
+        ttk.Checkbutton(self.metrics_frame, text="Export JSONL", variable=self.metrics_to_file,
+                        command=self.update_metrics_export).grid(row=0, column=1, padx=5)
+        self.metrics_to_http = tk.BooleanVar()
+        ttk.Checkbutton(self.metrics_frame, text="HTTP port:", variable=self.metrics_to_http,
+                        command=self.update_metrics_export).grid(row=0, column=2, padx=(5, 0))
+        self.metrics_port_var = tk.StringVar(value="8765")
+        ttk.Entry(self.metrics_frame, textvariable=self.metrics_port_var, width=6).grid(row=0, column=3, padx=5)
+        self.metrics_text = tk.Text(self.metrics_frame, height=12, font="TkFixedFont", state=tk.DISABLED)
+        self.metrics_text.grid(row=1, column=0, columnspan=6, sticky='ew', pady=(2, 0))
+        self.metrics_frame.grid_remove()
+        
+        # Bind events
+        self.message_entry.bind('<Up>', self.history_up)
+        self.message_entry.bind('<Down>', self.history_down)
+        self.search_entry.bind('<Return>', lambda e: self.search_next())
+        self.search_entry.bind('<Shift-Return>', lambda e: self.search_prev())
+        self.message_entry.bind('<Return>', lambda e: self.send_message())
+        
+        # Info label for additional port details
+        self.port_info_label = ttk.Label(control_frame, text="", wraplength=400)
+        self.port_info_label.grid(row=1, column=0, columnspan=5, padx=5, pady=(2, 0), sticky='w')
+        
+        # Set minimum window size
+        if self.standalone:
+            self.root.update()
+            self.root.minsize(self.root.winfo_width(), self.root.winfo_height())
+
+        # Add auto-reconnect checkbox
+        self.auto_reconnect = tk.BooleanVar()
+        self.auto_reconnect_check = ttk.Checkbutton(control_frame, text="Auto-reconnect", 
+                                                   variable=self.auto_reconnect,
+                                                   command=self.on_auto_reconnect_toggled)
+        self.auto_reconnect_check.grid(row=0, column=5, padx=5)
+        
+        # Include/exclude/highlight rules editor
+        ttk.Button(control_frame, text="Rules...", command=self.open_rules_editor).grid(row=0, column=6, padx=5)
+        
+        # Live plot of numeric telemetry fields
+        ttk.Button(control_frame, text="Plot...", command=self.open_plot).grid(row=0, column=7, padx=5)
+        
+        # Expect-style scripts run against the connected device
+        self.script_button = ttk.Button(control_frame, text="Script...", command=self.toggle_script)
+        self.script_button.grid(row=0, column=8, padx=5)
+        
+        # Browse saved history logs and captures of any size
+        ttk.Button(control_frame, text="Open log...", command=self.open_log).grid(row=0, column=9, padx=5)
+        
+        # Start the display flush timer
+        self.root.after(FLUSH_INTERVAL_MS, self.flush_pending)
+        
+        # Start hot-plug port watcher (a shared one is started by its owner)
+        if self.standalone:
+            self.port_watcher.start()
+        else:
+            self.update_ports_list(self.port_watcher.snapshot)
+
+    def clear_chat(self):
+        """Clear the chat window."""
+        self.chat_text.configure(state=tk.NORMAL)
+        self.chat_text.delete(1.0, tk.END)
+        self.chat_text.configure(state=tk.DISABLED)
+        self.scrollback.clear()
+        self.search_index.reset()
+        self.search_label.configure(text="")
+    
+    def update_scrollback_limit(self):
+        """Apply the scrollback line limit from the entry, ignoring invalid input."""
+        try:
+            max_lines = int(self.scrollback_var.get())
+        except ValueError:
+            return
+        if max_lines > 0:
+            self.scrollback.max_lines = max_lines
+    
+    def toggle_history_log(self):
+        """Open or close the on-disk history log."""
+        if self.log_to_file.get():
+            try:
+                os.makedirs(HISTORY_DIR, exist_ok=True)
+                name = time.strftime(f"{self.file_prefix()}-%Y%m%d-%H%M%S.log")
+                path = os.path.join(HISTORY_DIR, name)
+                self.history_file = open(path, "a", encoding="utf-8", buffering=1024 * 1024)
+                self.add_message(f"Logging history to {path}", "system")
+            except OSError as e:
+                self.log_to_file.set(False)
+                self.add_message(f"Could not open history log: {str(e)}", "error")
+        else:
+            self.close_history_log()
+    
+    def file_prefix(self):
+        """Name log and capture files after the device so tabs never collide."""
+        if self.session.device:
+            return os.path.basename(self.session.device)
+        return "session"
+    
+    def close_history_log(self):
+        """Flush and close the on-disk history log if it is open."""
+        if self.history_file:
+            self.history_file.close()
+            self.history_file = None
+    
+    def toggle_capture(self):
+        """Start or stop the raw binary capture of rx/tx traffic."""
+        if self.capture_raw.get():
+            try:
+                capture = CaptureWriter.create(prefix=self.file_prefix())
+            except OSError as e:
+                self.capture_raw.set(False)
+                self.add_message(f"Could not start capture: {str(e)}", "error")
+                return
+            self.session.set_capture(capture)
+            self.add_message(f"Capturing raw traffic to {capture.path}", "system")
+        else:
+            self.close_capture()
+    
+    def close_capture(self):
+        """Stop the raw capture if it is running."""
+        capture = self.session.capture
+        if capture:
+            self.session.set_capture(None)
+            capture.close()
+            self.add_message(f"Captured {capture.bytes_written} bytes to {capture.path}", "system")
+    
+    def toggle_metrics_panel(self):
+        """Show or hide the instrumentation panel."""
+        if self.metrics_frame.winfo_ismapped():
+            self.metrics_frame.grid_remove()
+            self.metrics_button.configure(text="Metrics ▸")
+        else:
+            self.metrics_frame.grid()
+            self.metrics_button.configure(text="Metrics ▾")
+            self.refresh_metrics_panel()
+    
+    def toggle_metrics(self):
+        """Start or stop collecting metrics; nothing is measured while off."""
+        if self.metrics_enabled.get():
+            self.session.set_metrics(Metrics(self.file_prefix()))
+            self.metrics_previous = None
+        else:
+            self.session.set_metrics(None)
+        self.update_metrics_export()
+        self.refresh_metrics_panel()
+    
+    def update_metrics_export(self):
+        """Restart the exporter with the selected file/HTTP outputs."""
+        self.close_metrics_export()
+        metrics = self.session.metrics
+        if not metrics or not (self.metrics_to_file.get() or self.metrics_to_http.get()):
+            return
+        path = None
+        if self.metrics_to_file.get():
+            name = time.strftime(f"metrics-{self.file_prefix()}-%Y%m%d-%H%M%S.jsonl")
+            path = os.path.join(METRICS_DIR, name)
+        http_port = None
+        if self.metrics_to_http.get():
+            try:
+                http_port = int(self.metrics_port_var.get())
+            except ValueError:
+                self.metrics_to_http.set(False)
+                self.add_message("HTTP port must be a number", "error")
+                return
+        try:
+            self.metrics_exporter = MetricsExporter([metrics], path=path, http_port=http_port)
+        except OSError as e:
+            self.metrics_to_file.set(False)
+            self.metrics_to_http.set(False)
+            self.add_message(f"Could not export metrics: {str(e)}", "error")
+            return
+        if path:
+            self.add_message(f"Exporting metrics to {path}", "system")
+        if http_port is not None:
+            self.add_message(f"Serving metrics at http://127.0.0.1:{self.metrics_exporter.http_port}/", "system")
+    
+    def close_metrics_export(self):
+        if self.metrics_exporter:
+            self.metrics_exporter.close()
+            self.metrics_exporter = None
+    
+    def refresh_metrics_panel(self):
+        """Show the current counters, rates and histograms in the panel."""
+        metrics = self.session.metrics
+        if metrics:
+            snapshot = metrics.snapshot()
+            lines = format_snapshot(snapshot, self.metrics_previous)
+            self.metrics_previous = snapshot
+        else:
+            lines = ["Metrics are off"]
+        self.metrics_text.configure(state=tk.NORMAL)
+        self.metrics_text.delete("1.0", tk.END)
+        self.metrics_text.insert("1.0", "\n".join(lines))
+        self.metrics_text.configure(state=tk.DISABLED)
+    
+    def trim_scrollback(self):
+        """Delete the oldest display lines in bulk and drop their search matches."""
+        count = self.scrollback.trim()
+        if not count:
+            return
+        self.chat_text.configure(state=tk.NORMAL)
+        self.chat_text.delete("1.0", f"{count + 1}.0")
+        self.chat_text.configure(state=tk.DISABLED)
+        self.search_index.trim(self.scrollback.first)
+    
+    def on_ports_changed(self, snapshot, added, removed):
+        """Forward a port snapshot from the watcher thread to the GUI thread."""
+        self.root.after(0, lambda: self.update_ports_list(snapshot))
+        if added:
+            self.session.notify_hotplug()
+    
+    def update_ports_list(self, snapshot):
+        """Swap in a new port snapshot and update the ports dropdown menu."""
+        self.port_info = snapshot
+        ports = [description for description, info in snapshot.items()
+                 if is_serial_device(info['device'])]
+        current = self.port_var.get()
+        self.port_combo['values'] = ports
+        if current in ports:
+            self.update_port_info(current)
+        elif ports:
+            self.port_var.set(ports[0])
+            self.update_port_info(ports[0])
+    
+    def on_port_selected(self, event):
+        """Handle port selection change."""
+        selected = self.port_var.get()
+        self.update_port_info(selected)
+    
+    def update_port_info(self, selected):
+        """Update the port information label."""
+        if selected in self.port_info:
+            info = self.port_info[selected]
+            details = []
+            
+            if info['manufacturer']:
+                details.append(f"Manufacturer: {info['manufacturer']}")
+            if info['product']:
+                details.append(f"Product: {info['product']}")
+            if info['serial_number']:
+                details.append(f"Serial: {info['serial_number']}")
+            if info['vid'] is not None and info['pid'] is not None:
+                details.append(f"VID:PID = {info['vid']:04X}:{info['pid']:04X}")
+            
+            info_text = " | ".join(details) if details else "No additional information available"
+            self.port_info_label.configure(text=info_text)
+        else:
+            self.port_info_label.configure(text="")
+    
+    def send_message(self):
+        """Queue message(s) for the writer thread, handling semicolons."""
+        message_input = self.message_var.get().strip()
+        if message_input and self.session.is_connected:
+            try:
+                items = parse_commands(message_input)
+            except ValueError as e:
+                self.add_message(str(e), "error")
+                return # Stop if one sub-command is bad.
+            if not items or not self.apply_pacing():
+                return
+            if not self.session.send(items):
+                self.add_message("Send queue is full", "error")
+                return
+            self.command_history.append(message_input)
+            self.history_position = -1
+            self.message_var.set("")
+    
+    def apply_pacing(self):
+        """Push the delay and prompt settings to the session; return False if invalid."""
+        try:
+            delay = int(self.delay_var.get()) / 1000
+            self.session.set_pacing(delay, self.prompt_var.get())
+        except ValueError:
+            self.add_message("Delay must be a whole number of milliseconds", "error")
+            return False
+        except re.error as e:
+            self.add_message(f"Invalid prompt pattern: {str(e)}", "error")
+            return False
+        return True
+    
+    def apply_framing(self):
+        """Push the framing and hex dump settings to the session; return False if invalid."""
+        try:
+            self.session.set_framing(self.framing_var.get(), self.hex_view.get())
+        except ValueError as e:
+            self.add_message(str(e), "error")
+            return False
+        return True
+    
+    def cancel_sends(self):
+        """Drop any queued sends and abort the one in progress."""
+        if self.upload:
+            self.upload.cancel()
+        self.session.cancel_sends()
+    
+    def add_message(self, message, message_type):
+        """Queue a message for the chat display (safe to call from any thread)."""
+        if "\n" in message:
+            message = message.replace("\r", "").replace("\n", " ")
+        self.queue_messages([(message, message_type)])
+    
+    def queue_messages(self, messages):
+        """Queue several (message, message_type) pairs for the next display flush."""
+        overflow = len(self.pending) + len(messages) - MAX_PENDING_LINES
+        if overflow > 0:
+            self.dropped_lines += overflow
+            metrics = self.session.metrics
+            if metrics:
+                metrics.add("ui_dropped_lines", overflow)
+        self.pending.extend(messages)
+    
+    def flush_pending(self):
+        """Apply queued messages to the chat display with a single insert and scroll."""
+        if not self.running:
+            return
+        
+        pending = self.pending
+        count = min(len(pending), MAX_LINES_PER_FLUSH)
+        metrics = self.session.metrics
+        if metrics:
+            metrics.set("ui_queue_depth", len(pending))
+            started = time.perf_counter()
+        if count:
+            # Coalesce consecutive lines sharing a tag into one text segment
+            lines = []
+            segments = []
+            chunk_start = 0
+            chunk_tag = None
+            for _ in range(count):
+                message, message_type = pending.popleft()
+                prefix = MESSAGE_PREFIXES.get(message_type)
+                if prefix is None:
+                    if message_type.startswith(HIGHLIGHT_PREFIX):
+                        # Highlighted received line; the tag is the colour
+                        prefix = MESSAGE_PREFIXES["received"]
+                        if message_type not in self.highlight_tags:
+                            self.configure_highlight(message_type)
+                    else:
+                        message_type = "system"
+                        prefix = MESSAGE_PREFIXES[message_type]
+                if message_type != chunk_tag and lines:
+                    segments.append("\n".join(lines[chunk_start:]) + "\n")
+                    segments.append(chunk_tag)
+                    chunk_start = len(lines)
+                chunk_tag = message_type
+                lines.append(f"{prefix}{message}")
+            segments.append("\n".join(lines[chunk_start:]) + "\n")
+            segments.append(chunk_tag)
+            
+            self.chat_text.configure(state=tk.NORMAL)
+            self.chat_text.insert(tk.END, *segments)
+            self.chat_text.configure(state=tk.DISABLED)
+            if self.search_index.add_lines(lines, self.scrollback.end):
+                self.update_search_label()
+            self.scrollback.append(lines)
+            self.trim_scrollback()
+            self.chat_text.see(tk.END)
+            self.flushed_lines += count
+            
+            if self.history_file:
+                self.history_file.write("\n".join(lines) + "\n")
+            
+            if metrics:
+                metrics.add("ui_lines", count)
+                metrics.add("ui_coalesced_lines", count - len(segments) // 2)
+                metrics.observe("flush_time", time.perf_counter() - started)
+        
+        self.update_status()
+        self.root.after(FLUSH_INTERVAL_MS, self.flush_pending)
+    
+    def configure_highlight(self, tag):
+        """Create the display tag for a rule highlight colour."""
+        color = tag[len(HIGHLIGHT_PREFIX):]
+        try:
+            self.chat_text.tag_configure(tag, foreground=MESSAGE_COLORS["received"], background=color)
+        except tk.TclError:
+            # Unknown colour name: fall back to the default highlight
+            self.chat_text.tag_configure(tag, foreground=MESSAGE_COLORS["received"], background="yellow")
+        # Keep search hits visible on top of rule highlights
+        self.chat_text.tag_lower(tag, "search_hit")
+        self.highlight_tags.add(tag)
+    
+    def update_status(self):
+        """Refresh the lines/s and queue depth display about once per second."""
+        now = time.monotonic()
+        elapsed = now - self.rate_started
+        if elapsed < 1.0:
+            return
+        rate = (self.flushed_lines - self.rate_lines) / elapsed
+        self.rate_lines = self.flushed_lines
+        self.rate_started = now
+        
+        status = f"Lines/s: {rate:.0f} | Queue: {len(self.pending)}"
+        if self.dropped_lines:
+            status += f" | Dropped: {self.dropped_lines}"
+        pending_sends = self.session.pending_sends()
+        if pending_sends:
+            status += f" | Send queue: {pending_sends}"
+        runner = self.script_runner
+        if runner:
+            status += f" | Script: {runner.iterations} iterations"
+        ring = self.session.ring_stats()
+        if ring:
+            status += (f" | Ring: {ring['used'] / ring['capacity']:.0%} "
+                       f"(peak {ring['high_water'] / ring['capacity']:.0%})")
+            if ring["overruns"]:
+                status += f" | Overruns: {ring['overruns']} ({ring['overrun_bytes']} bytes)"
+        upload = self.upload
+        if upload:
+            fraction, speed = upload.progress()
+            status += f" | Upload: {fraction:.0%} {speed / 1024:.1f} KB/s"
+        self.status_label.configure(text=status)
+        if self.capture_raw.get() and not self.session.capture:
+            self.capture_raw.set(False)  # Stopped by a disk error
+        if self.session.metrics and self.metrics_frame.winfo_ismapped():
+            self.refresh_metrics_panel()
+    
+    def history_up(self, event):
+        """Navigate up through command history."""
+        if self.command_history:
+            self.history_position = min(self.history_position + 1, len(self.command_history) - 1)
+            self.message_var.set(list(self.command_history)[-self.history_position - 1])
+    
+    def history_down(self, event):
+        """Navigate down through command history."""
+        if self.history_position > -1:
+            self.history_position -= 1
+            if self.history_position == -1:
+                self.message_var.set("")
+            else:
+                self.message_var.set(list(self.command_history)[-self.history_position - 1])
+    
+    def search_next(self):
+        """Jump to the next occurrence of the search term."""
+        self.search_step(forward=True)
+    
+    def search_prev(self):
+        """Jump to the previous occurrence of the search term."""
+        self.search_step(forward=False)
+    
+    def search_step(self, forward):
+        """Step through the search matches, timing the step when metrics are on."""
+        metrics = self.session.metrics
+        if metrics:
+            started = time.perf_counter()
+            self.step_search(forward)
+            metrics.observe("search_time", time.perf_counter() - started)
+        else:
+            self.step_search(forward)
+    
+    def step_search(self, forward):
+        """Move through the incremental match list, re-indexing only if the term changed."""
+        term = self.search_var.get()
+        regex = self.search_regex.get()
+        case = self.search_case.get()
+        index = self.search_index
+        if index.options_changed(term, regex, case):
+            try:
+                index.set_term(term, self.scrollback.lines, self.scrollback.first, regex, case)
+            except re.error as e:
+                self.search_label.configure(text=f"Invalid pattern: {str(e)}")
+                self.refresh_search_highlight()
+                return
+        if not term:
+            self.search_label.configure(text="")
+            self.refresh_search_highlight()
+            return
+        
+        match = index.step(forward, from_line=self.first_visible_line())
+        if match is None:
+            self.search_label.configure(text="No matches found")
+            self.refresh_search_highlight()
+            return
+        
+        # Scroll to match
+        line, start, end = match
+        display_line = line - self.scrollback.first + 1
+        self.chat_text.see(f"{display_line}.{start}")
+        self.refresh_search_highlight()
+        self.update_search_label()
+    
+    def update_search_label(self):
+        """Show the current match position and the live match count."""
+        index = self.search_index
+        if index.current >= 0:
+            self.search_label.configure(text=f"Match {index.current + 1} of {len(index)}")
+        else:
+            self.search_label.configure(text=f"{len(index)} matches")
+    
+    def first_visible_line(self):
+        """Return the absolute line number at the top of the chat view."""
+        top = int(self.chat_text.index("@0,0").split(".")[0])
+        return self.scrollback.first + top - 1
+    
+    def on_chat_scroll(self, first, last):
+        """Update the scrollbar and schedule a highlight refresh for the new view."""
+        self.chat_scrollbar.set(first, last)
+        if self.search_index.is_active() and not self.highlight_pending:
+            self.highlight_pending = True
+            self.root.after_idle(self.refresh_search_highlight)
+    
+    def refresh_search_highlight(self):
+        """Tag search hits within the visible region of the chat display only."""
+        self.highlight_pending = False
+        if not self.running:
+            return
+        text = self.chat_text
+        text.tag_remove("search_hit", "1.0", tk.END)
+        text.tag_remove("search_current", "1.0", tk.END)
+        index = self.search_index
+        if not index.is_active() or not len(index):
+            return
+        
+        first = self.scrollback.first
+        top = int(text.index("@0,0").split(".")[0])
+        bottom = int(text.index(f"@0,{text.winfo_height()}").split(".")[0])
+        hits = []
+        for line, start, end in index.in_range(first + top - 1, first + bottom - 1):
+            display_line = line - first + 1
+            hits.append(f"{display_line}.{start}")
+            hits.append(f"{display_line}.{end}")
+        if hits:
+            text.tag_add("search_hit", *hits)
+        if index.current >= 0:
+            line, start, end = index.matches[index.current]
+            display_line = line - first + 1
+            text.tag_add("search_current", f"{display_line}.{start}", f"{display_line}.{end}")
+
+    def toggle_connection(self):
+        """Handle connection/disconnection to serial port."""
+        session = self.session
+        session.stop_reconnect()
+        if not session.is_connected:
+            if not self.connect() and self.auto_reconnect.get() and session.identity:
+                session.start_reconnect()
+        else:
+            session.close(reconnect=False)
+
+    def connect(self):
+        """Open the selected port through the session; return True on success."""
+        selected = self.port_var.get()
+        identity = None
+        if selected in self.port_info:
+            port_info = self.port_info[selected]
+            device = port_info['device']
+            # Remember the device identity for auto-reconnect
+            identity = port_identity(port_info)
+        elif os.path.exists(selected):
+            # A device path typed by hand, e.g. the pty of a capture replay
+            device = selected
+        else:
+            return False
+        
+        if not self.apply_framing():
+            return False
+        try:
+            baud = int(self.baud_var.get())
+            # Takes effect on the next connect
+            self.session.capture_process = self.capture_process.get()
+            self.session.open(device, baud, self.flow_var.get(), identity, label=selected)
+            return True
+        except Exception as e:
+            self.add_message(f"Connection error: {str(e)}", "error")
+        return False
+
+    def update_connection_state(self):
+        """Reflect the session's connection state in the controls."""
+        if not self.running:
+            return
+        session = self.session
+        if session.is_connected:
+            self.connect_button.configure(text="Disconnect")
+            if session.label in self.port_info and session.label != self.port_var.get():
+                # Reconnected, possibly under a new device name
+                self.port_var.set(session.label)
+                self.update_port_info(session.label)
+        else:
+            self.connect_button.configure(text="Connect")
+        if self.on_connection_change:
+            self.on_connection_change(self)
+
+    def on_auto_reconnect_toggled(self):
+        """Pass the auto-reconnect setting on, cancelling any pending reconnection."""
+        self.session.auto_reconnect = self.auto_reconnect.get()
+        if not self.session.auto_reconnect:
+            self.session.stop_reconnect()
+
+    def on_filter_toggled(self):
+        """Pass the 'wait' filter setting on to the reader."""
+        self.session.set_rules(filter_wait=self.filter_wait.get())
+
+    def open_rules_editor(self):
+        """Show the rules editor with live per-rule hit counters."""
+        if self.rules_window:
+            self.rules_window.lift()
+            return
+        window = tk.Toplevel(self.root)
+        window.title(f"Rules - {self.session.label or 'Serial Chat'}")
+        window.columnconfigure(0, weight=1)
+        window.rowconfigure(1, weight=1)
+        ttk.Label(window, text="One rule per line: include|exclude|highlight[:color] text or /regex/[i]").grid(
+            row=0, column=0, columnspan=2, sticky='w', padx=5, pady=(5, 0))
+        
+        editor = tk.Text(window, width=60, height=10, undo=True)
+        editor.grid(row=1, column=0, columnspan=2, sticky='nsew', padx=5, pady=5)
+        editor.insert("1.0", self.rules_source)
+        
+        error_label = ttk.Label(window, text="", foreground="red")
+        error_label.grid(row=2, column=0, sticky='w', padx=5)
+        
+        def apply():
+            source = editor.get("1.0", "end-1c")
+            try:
+                self.session.set_rules(parse_rules(source))
+            except ValueError as e:
+                error_label.configure(text=str(e))
+                return
+            self.rules_source = source
+            error_label.configure(text="")
+            refresh_stats()
+        
+        ttk.Button(window, text="Apply", command=apply).grid(row=2, column=1, sticky='e', padx=5)
+        
+        stats_text = tk.Text(window, width=60, height=8, state=tk.DISABLED)
+        stats_text.grid(row=3, column=0, columnspan=2, sticky='nsew', padx=5, pady=5)
+        
+        def refresh_stats():
+            rules = self.session.rules
+            counters = rules.counters
+            lines = [f"{hits:>10}  {source}" for source, hits in rules.stats()]
+            lines.append(f"Lines checked: {counters.lines_seen} | Dropped: {counters.lines_dropped} | "
+                         f"Filter time: {counters.time_ns / 1e6:.1f} ms")
+            stats_text.configure(state=tk.NORMAL)
+            stats_text.delete("1.0", tk.END)
+            stats_text.insert("1.0", "\n".join(lines))
+            stats_text.configure(state=tk.DISABLED)
+        
+        def poll_stats():
+            if self.rules_window is window and self.running:
+                refresh_stats()
+                window.after(1000, poll_stats)
+        
+        def close():
+            self.rules_window = None
+            window.destroy()
+        
+        window.protocol("WM_DELETE_WINDOW", close)
+        self.rules_window = window
+        poll_stats()
+
+    def toggle_script(self):
+        """Pick and start a script, or stop the one that is running."""
+        if self.script_runner:
+            self.script_runner.stop()
+            return
+        if not self.session.is_connected:
+            self.add_message("Connect before running a script", "error")
+            return
+        path = filedialog.askopenfilename(parent=self.root, title="Run script")
+        if not path:
+            return
+        try:
+            with open(path, encoding="utf-8") as f:
+                steps = parse_script(f.read())
+        except (OSError, ValueError) as e:
+            self.add_message(f"Could not load script: {str(e)}", "error")
+            return
+        self.script_runner = ScriptRunner(self.session, steps,
+                                          on_finish=lambda runner: self.root.after(0, self.on_script_finished))
+        self.script_button.configure(text="Stop script")
+        self.add_message(f"Running script {os.path.basename(path)}", "system")
+        self.script_runner.start()
+
+    def on_script_finished(self):
+        """Show the script report once the runner thread has ended."""
+        runner = self.script_runner
+        self.script_runner = None
+        if not self.running or runner is None:
+            return
+        self.script_button.configure(text="Script...")
+        passed = runner.passed()
+        for line in runner.report():
+            self.add_message(line, "system" if passed else "error")
+
+    def toggle_upload(self):
+        """Pick a file and stream it to the device, or cancel the upload in progress."""
+        if self.upload:
+            self.upload.cancel()
+            return
+        if not self.session.is_connected:
+            self.add_message("Connect before uploading", "error")
+            return
+        path = filedialog.askopenfilename(parent=self.root, title="Upload file")
+        if not path:
+            return
+        try:
+            self.upload = Upload(self.session, path, protocol=self.upload_protocol_var.get(),
+                                 chunk_size=int(self.upload_chunk_var.get()),
+                                 window=int(self.upload_window_var.get()),
+                                 ack=self.upload_ack_var.get() or None,
+                                 lines=self.upload_lines.get(),
+                                 on_finish=lambda upload: self.root.after(0, self.on_upload_finished))
+        except (OSError, ValueError, re.error) as e:
+            self.add_message(f"Could not start upload: {str(e)}", "error")
+            return
+        self.upload_button.configure(text="Stop upload")
+        self.add_message(f"Uploading {os.path.basename(path)} ({self.upload.total} bytes, "
+                         f"{self.upload.protocol})", "system")
+        self.upload.start()
+
+    def on_upload_finished(self):
+        """Report the result once the upload thread has ended."""
+        upload = self.upload
+        self.upload = None
+        if not self.running or upload is None:
+            return
+        self.upload_button.configure(text="Upload...")
+        if upload.error:
+            self.add_message(f"Upload failed after {upload.bytes_sent} bytes: {upload.error}", "error")
+        else:
+            speed = upload.bytes_sent / upload.elapsed if upload.elapsed else 0.0
+            self.add_message(f"Uploaded {upload.bytes_sent} bytes in {upload.elapsed:.2f} s "
+                             f"({speed / 1024:.1f} KB/s)", "system")
+
+    def open_plot(self):
+        """Show the telemetry plot window (needs NumPy)."""
+        if self.plot:
+            self.plot.lift()
+            return
+        try:
+            from plot import TelemetryPlot
+        except ImportError as e:
+            self.add_message(f"Telemetry plotting needs NumPy: {str(e)}", "error")
+            return
+        self.plot = TelemetryPlot(self.root, self.session, on_close=self.on_plot_closed)
+
+    def on_plot_closed(self):
+        self.plot = None
+
+    def open_log(self):
+        """Open a history log or capture file in a virtualized viewer window."""
+        path = filedialog.askopenfilename(parent=self.root, title="Open log", initialdir=HISTORY_DIR,
+                                          filetypes=[("Logs and captures", "*.log *.txt *.scap"),
+                                                     ("All files", "*")])
+        if not path:
+            return
+        try:
+            viewer = LogViewer(self.root, path, on_close=self.log_viewers.remove)
+        except (OSError, ValueError) as e:
+            self.add_message(f"Could not open log: {str(e)}", "error")
+            return
+        self.log_viewers.append(viewer)
+
+    def shutdown(self):
+        """Close the session, logs and capture of this view."""
+        self.running = False
+        self.auto_reconnect.set(False)  # Disable auto-reconnect before closing
+        if self.rules_window:
+            self.rules_window.destroy()
+            self.rules_window = None
+        if self.plot:
+            self.plot.close()
+        for viewer in list(self.log_viewers):
+            viewer.close()
+        self.close_metrics_export()
+        if self.script_runner:
+            self.script_runner.stop()
+        if self.upload:
+            self.upload.cancel()
+        self.session.shutdown()
+        self.close_history_log()
+        self.close_capture()
+
+    def on_closing(self):
+        """Clean up when closing the application."""
+        self.port_watcher.stop()
+        self.shutdown()
+        self.root.destroy()
+
+class MultiMonitorGUI:
+    """Several device views in notebook tabs sharing one port watcher and reader pool."""
+    
+    def __init__(self, root, tabs=2):
+        self.root = root
+        self.root.title("Serial Chat")
+        self.root.columnconfigure(0, weight=1)
+        self.root.rowconfigure(1, weight=1)
+        
+        # Shared port enumeration and a single reader thread for all devices
+        self.port_watcher = PortWatcher(self.on_ports_changed)
+        self.reader_pool = ReaderPool()
+        self.views = []
+        
+        # Tab controls
+        toolbar = ttk.Frame(root)
+        toolbar.grid(row=0, column=0, sticky='ew', padx=10, pady=(10, 0))
+        ttk.Button(toolbar, text="New tab", command=self.add_tab).grid(row=0, column=0)
+        ttk.Button(toolbar, text="Close tab", command=self.close_tab).grid(row=0, column=1, padx=5)
+        
+        self.notebook = ttk.Notebook(root)
+        self.notebook.grid(row=1, column=0, sticky='nsew')
+        for _ in range(max(tabs, 1)):
+            self.add_tab()
+        
+        self.port_watcher.start()
+    
+    def add_tab(self):
+        """Add a tab with its own session, scrollback and capture."""
+        frame = ttk.Frame(self.notebook)
+        self.notebook.add(frame, text=f"Device {len(self.views) + 1}")
+        view = SerialChatGUI(self.root, parent=frame, port_watcher=self.port_watcher,
+                             reader_pool=self.reader_pool,
+                             on_connection_change=self.update_tab_title)
+        self.views.append(view)
+        self.notebook.select(frame)
+    
+    def close_tab(self):
+        """Shut down and remove the selected tab."""
+        selected = self.notebook.select()
+        for view in self.views:
+            if str(view.container) == selected:
+                view.shutdown()
+                self.views.remove(view)
+                self.notebook.forget(view.container)
+                view.container.destroy()
+                return
+    
+    def update_tab_title(self, view):
+        """Show the connected device in the tab title."""
+        session = view.session
+        title = os.path.basename(session.device) if session.device else "Device"
+        if not session.is_connected:
+            title += " (closed)"
+        self.notebook.tab(view.container, text=title)
+    
+    def on_ports_changed(self, snapshot, added, removed):
+        """Fan port changes out to every view (called from the watcher thread)."""
+        for view in list(self.views):
+            view.on_ports_changed(snapshot, added, removed)
+    
+    def on_closing(self):
+        """Clean up all sessions when closing the application."""
+        self.port_watcher.stop()
+        for view in self.views:
+            view.shutdown()
+        self.root.destroy()
+
+def main(tabs=0):
+    root = tk.Tk()
+    app = MultiMonitorGUI(root, tabs) if tabs else SerialChatGUI(root)
+    root.protocol("WM_DELETE_WINDOW", app.on_closing)
+    
+    # Set initial window size
+    root.geometry("800x600")
+    
+    root.mainloop()
@@ -0,0 +1,579 @@
+"""Random access to the lines of multi-gigabyte logs and captures.
+
+A log is memory-mapped and split into segments of about SEGMENT_SIZE
+bytes. A background thread records, per segment, where it starts in the
+byte stream and how many newlines precede it, so the index stays tiny
+(a few bytes per 64 KiB) and lines become available as soon as the first
+segment is counted. A line is found by bisecting the segments and then
+scanning at most one segment.
+
+Plain-text logs are their own byte stream. For capture files (.scap) the
+stream is the received (rx) payloads in order, and each segment also
+records the file offset and timestamp of its first record.
+
+Searches, filters and time jumps run over line-aligned segment chunks on
+a LogJob thread, with progress, so the caller never waits on a full pass.
+"""
+import mmap
+import os
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+
+from capture import HEADER, RECORD, CAPTURE_MAGIC, CAPTURE_VERSION, RX
+from filters import parse_pattern
+from framing import decode_line
+
+SEGMENT_SIZE = 64 * 1024
+READ_SIZE = 256 * 1024
+MAX_LINE_BYTES = 1024 * 1024  # Longer lines are cut when completing a chunk
+MAX_DISPLAY_CHARS = 4096
+SEGMENT_CACHE = 8
+
+# Leading wall-clock time of a text log line, after an optional short prefix
+# such as "← " or "[": "12:34:56", "12:34:56.789" or "2024-01-01 12:34:56"
+TIME_PATTERN = re.compile(rb"^\D{0,4}(?:\d{4}-\d{2}-\d{2}[ T])?(\d{1,2}):(\d{2}):(\d{2}(?:\.\d+)?)",
+                          re.MULTILINE)
+
+
+def open_log(path):
+    """Open a capture file or plain-text log, picking the reader by its header."""
+    with open(path, "rb") as f:
+        magic = f.read(len(CAPTURE_MAGIC))
+    if magic == CAPTURE_MAGIC:
+        return CaptureLog(path)
+    return TextLog(path)
+
+
+def compile_pattern(pattern):
+    """Compile literal text or /regex/ or /regex/i for searching the raw bytes."""
+    pattern, regex, ignore_case = parse_pattern(pattern)
+    if not pattern:
+        raise ValueError("Empty pattern")
+    expression = pattern.encode() if regex else re.escape(pattern.encode())
+    try:
+        return re.compile(expression, re.MULTILINE | (re.IGNORECASE if ignore_case else 0))
+    except re.error as e:
+        raise ValueError(f"Invalid pattern: {str(e)}") from None
+
+
+def parse_clock(text):
+    """Parse "[+]HH:MM[:SS[.fff]]" or "+SECONDS" into (relative, seconds)."""
+    text = text.strip()
+    relative = text.startswith("+")
+    text = text.lstrip("+")
+    try:
+        parts = [float(part) for part in text.split(":")]
+    except ValueError:
+        raise ValueError(f"Not a time: {text}") from None
+    if not parts or len(parts) > 3:
+        raise ValueError(f"Not a time: {text}")
+    if not relative and len(parts) == 1:
+        raise ValueError("Give a time of day as HH:MM[:SS] or an offset as +SECONDS")
+    seconds = 0.0
+    for part in parts:
+        seconds = seconds * 60 + part
+    return relative, seconds
+
+
+def matching_lines(pattern, data, line):
+    """Yield the line numbers of lines in data that pattern matches.
+
+    data holds whole lines, the first of which is line number line. One
+    match per line is enough, and matches spanning a newline are ignored.
+    """
+    search = pattern.search
+    counted = 0
+    position = 0
+    size = len(data)
+    while position <= size:
+        match = search(data, position)
+        if not match:
+            return
+        start = match.start()
+        end_of_line = data.find(b"\n", start)
+        if end_of_line != -1 and match.end() > end_of_line:
+            # Crossed into the next line: retry from the next character
+            position = start + 1
+            continue
+        line += data.count(b"\n", counted, start)
+        counted = start
+        yield line
+        if end_of_line == -1:
+            return
+        position = end_of_line + 1
+
+
+class LogJob:
+    """A cancellable background pass over a log with progress reporting.
+
+    work(job) runs on the job's thread, updates job.progress (0..1) and
+    stores its answer in job.result; job.error is set to a message if it
+    raised anything at all, so a failed job never looks like "no match".
+    """
+
+    def __init__(self, work, description, result=None):
+        self.work = work
+        self.description = description
+        self.progress = 0.0
+        self.result = result
+        self.error = None
+        self.cancelled = False
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        try:
+            self.work(self)
+        except (ValueError, OSError) as e:
+            self.error = str(e)
+        except Exception as e:
+            # E.g. the file shrinking under the map; report it like any other error
+            self.error = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+        self.elapsed = time.perf_counter() - self.started
+
+    def is_running(self):
+        return self.thread.is_alive()
+
+    def cancel(self):
+        self.cancelled = True
+
+    def wait(self, timeout=None):
+        self.thread.join(timeout)
+
+
+class MappedLog:
+    """Line access to a memory-mapped log through a sparse segment index."""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.size = os.fstat(self.file.fileno()).st_size
+        # Only what is on disk now is mapped; a log still being written is cut there
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b""
+        self.starts = array("Q")  # Stream offset of each segment
+        self.lines_before = array("Q")  # Newlines in the stream before each segment
+        self.segments = 0  # Segments indexed so far, published after their entries
+        self.stream_size = 0
+        self.line_count = 0
+        self.indexed_bytes = 0
+        self.done = False
+        self.closed = False
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+        try:
+            self.read_header()
+        except ValueError:
+            self.close_files()
+            raise
+        self.thread = threading.Thread(target=self.build_index, daemon=True)
+        self.thread.start()
+
+    def read_header(self):
+        pass
+
+    @property
+    def progress(self):
+        return self.indexed_bytes / self.size if self.size else 1.0
+
+    def build_index(self):
+        """Index thread: count the newlines of each segment as it is scanned."""
+        newlines = 0
+        last = b""
+        try:
+            for start, data in self.scan():
+                if self.closed:
+                    return
+                self.add_segment(start, newlines)
+                newlines += data.count(b"\n")
+                self.stream_size = start + len(data)
+                self.line_count = newlines
+                self.segments += 1
+                if data:
+                    last = data[-1:]
+        except (ValueError, OSError):
+            pass  # Index what could be read, e.g. up to a truncated record
+        if last and last != b"\n":
+            self.line_count = newlines + 1  # Last line has no newline
+        self.elapsed = time.perf_counter() - self.started
+        self.done = True
+
+    def add_segment(self, start, newlines):
+        self.starts.append(start)
+        self.lines_before.append(newlines)
+
+    def segment_end(self, k):
+        return self.starts[k + 1] if k + 1 < self.segments else self.stream_size
+
+    def read(self, offset, size):
+        """Return up to size bytes of the stream from offset."""
+        k = bisect_right(self.starts, offset, 0, self.segments) - 1
+        parts = []
+        while size > 0 and 0 <= k < self.segments:
+            data = self.segment_bytes(k)
+            part = data[offset - self.starts[k]:offset - self.starts[k] + size]
+            parts.append(part)
+            size -= len(part)
+            offset += len(part)
+            k += 1
+        return b"".join(parts)
+
+    def line_offset(self, number):
+        """Return the stream offset where line number (0-based) starts."""
+        if number <= 0:
+            return 0
+        # The segment holding the number-th newline
+        k = bisect_left(self.lines_before, number, 0, self.segments) - 1
+        data = self.segment_bytes(k)
+        position = -1
+        for _ in range(number - self.lines_before[k]):
+            position = data.find(b"\n", position + 1)
+            if position == -1:
+                return self.segment_end(k)
+        return self.starts[k] + position + 1
+
+    def line_number(self, offset):
+        """Return the number of the line holding stream offset."""
+        k = bisect_right(self.starts, offset, 0, self.segments) - 1
+        if k < 0:
+            return 0
+        return self.lines_before[k] + self.segment_bytes(k).count(b"\n", 0, offset - self.starts[k])
+
+    def lines(self, first, count):
+        """Return up to count display strings starting at line first."""
+        count = min(count, self.line_count - first)
+        if count <= 0:
+            return []
+        offset = self.line_offset(first)
+        lines = []
+        data = b""
+        position = 0
+        while len(lines) < count:
+            end = data.find(b"\n", position)
+            if end == -1:
+                if offset + len(data) >= self.stream_size:
+                    if position < len(data):
+                        lines.append(self.decode(data[position:]))
+                    break
+                if len(data) - position >= MAX_DISPLAY_CHARS:
+                    # A very long line: show its start and jump to the next one
+                    lines.append(self.decode(data[position:position + MAX_DISPLAY_CHARS]))
+                    offset = self.line_offset(first + len(lines))
+                    data, position = b"", 0
+                    continue
+                offset += position
+                data = data[position:] + self.read(offset + len(data) - position, READ_SIZE)
+                position = 0
+                continue
+            lines.append(self.decode(data[position:end]))
+            position = end + 1
+        return lines
+
+    def decode(self, raw):
+        return raw.rstrip(b"\r").decode("utf-8", "replace")[:MAX_DISPLAY_CHARS]
+
+    def segment_lines(self, k):
+        """Return (first line number, bytes) of the whole lines that start in segment k."""
+        start = self.starts[k]
+        data = self.segment_bytes(k)
+        line = self.lines_before[k]
+        if start and self.read(start - 1, 1) != b"\n":
+            cut = data.find(b"\n") + 1
+            if not cut:
+                return line + 1, b""
+            data = data[cut:]
+            line += 1
+        if data and not data.endswith(b"\n"):
+            # Complete the last line from the following segments
+            offset = self.segment_end(k)
+            rest = []
+            while offset < self.stream_size and offset - self.segment_end(k) < MAX_LINE_BYTES:
+                more = self.read(offset, READ_SIZE)
+                end = more.find(b"\n")
+                if end != -1:
+                    rest.append(more[:end + 1])
+                    break
+                rest.append(more)
+                offset += len(more)
+            data += b"".join(rest)
+        return line, data
+
+    def wait_segments(self, job, k):
+        """Wait until segment k is indexed; return False if it never will be."""
+        while k >= self.segments:
+            if self.done or job.cancelled:
+                return False
+            time.sleep(0.05)
+        return True
+
+    # Background jobs
+
+    def search(self, pattern, after, forward=True, accept=None):
+        """Start a job finding the next (or previous) matching line after line after.
+
+        The search wraps around once. accept(line) can reject matches, e.g.
+        lines hidden by a filter. job.result is the line number or None.
+        """
+        compiled = compile_pattern(pattern)
+
+        def work(job):
+            if forward:
+                job.result = self.find_forward(job, compiled, after + 1, accept)
+                if job.result is None and not job.cancelled and after >= 0:
+                    job.result = self.find_forward(job, compiled, 0, accept, until=after + 1)
+            else:
+                job.result = self.find_backward(job, compiled, after, accept)
+                if job.result is None and not job.cancelled:
+                    job.result = self.find_backward(job, compiled, self.line_count, accept,
+                                                    until=after)
+
+        return LogJob(work, f"Searching for {pattern}")
+
+    def find_forward(self, job, pattern, start, accept, until=None):
+        k = max(bisect_right(self.starts, self.line_offset(start), 0, self.segments) - 1, 0)
+        while self.wait_segments(job, k):
+            line, data = self.segment_lines(k)
+            for number in matching_lines(pattern, data, line):
+                if until is not None and number >= until:
+                    return None
+                if number >= start and (accept is None or accept(number)):
+                    return number
+            job.progress = (k + 1) / max(self.segments, 1)
+            k += 1
+        return None
+
+    def find_backward(self, job, pattern, before, accept, until=None):
+        k = min(bisect_right(self.starts, self.line_offset(before), 0, self.segments) - 1,
+                self.segments - 1)
+        total = k + 1
+        while k >= 0 and not job.cancelled:
+            line, data = self.segment_lines(k)
+            found = [number for number in matching_lines(pattern, data, line)
+                     if number < before and (accept is None or accept(number))]
+            if until is not None:
+                found = [number for number in found if number > until]
+            if found:
+                return found[-1]
+            job.progress = (total - k) / total
+            k -= 1
+        return None
+
+    def filter(self, pattern, exclude=False):
+        """Start a job collecting the numbers of lines that match (or, with exclude, don't).
+
+        job.result is an array that grows while the job runs, so a view can
+        show the lines found so far.
+        """
+        compiled = compile_pattern(pattern)
+
+        def work(job):
+            found = job.result
+            k = 0
+            while self.wait_segments(job, k):
+                line, data = self.segment_lines(k)
+                matched = matching_lines(compiled, data, line)
+                if exclude:
+                    # Every line between two matching ones
+                    count = data.count(b"\n") + (1 if data and not data.endswith(b"\n") else 0)
+                    previous = line
+                    for number in matched:
+                        found.extend(range(previous, number))
+                        previous = number + 1
+                    found.extend(range(previous, line + count))
+                else:
+                    found.extend(matched)
+                job.progress = (k + 1) / max(self.segments, 1)
+                k += 1
+
+        return LogJob(work, f"Filtering {'out ' if exclude else ''}{pattern}", result=array("Q"))
+
+    def jump_to_time(self, text):
+        """Start a job finding the first line at or after a time; job.result is its number."""
+        relative, seconds = parse_clock(text)
+
+        def work(job):
+            while not self.done and not job.cancelled:
+                job.progress = self.progress
+                time.sleep(0.05)  # Times are only ordered over the whole index
+            job.result = self.find_time(job, relative, seconds)
+
+        return LogJob(work, f"Jumping to {text}")
+
+    def close(self):
+        """Stop indexing and unmap the file (cancel running jobs first)."""
+        self.closed = True
+        self.thread.join()
+        self.close_files()
+
+    def close_files(self):
+        if self.size:
+            self.mm.close()
+        self.file.close()
+
+
+class TextLog(MappedLog):
+    """A plain-text log: the file itself is the byte stream."""
+
+    def scan(self):
+        for start in range(0, self.size, SEGMENT_SIZE):
+            yield start, self.mm[start:start + SEGMENT_SIZE]
+            self.indexed_bytes = min(start + SEGMENT_SIZE, self.size)
+
+    def segment_bytes(self, k):
+        start = self.starts[k]
+        return self.mm[start:start + SEGMENT_SIZE]
+
+    def read(self, offset, size):
+        return self.mm[offset:offset + size]
+
+    def line_time(self, data):
+        """Return the time of day (seconds) of the first timestamped line in data."""
+        match = TIME_PATTERN.search(data)
+        if not match:
+            return None
+        hours, minutes, seconds = match.groups()
+        return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+    def find_time(self, job, relative, seconds):
+        if relative:
+            first = self.line_time(self.segment_lines(0)[1]) if self.segments else None
+            if first is None:
+                raise ValueError("This log has no timestamps")
+            seconds += first
+        # Bisect the segments on the time of their first timestamped line
+        low, high = 0, self.segments
+        while low < high and not job.cancelled:
+            middle = (low + high) // 2
+            value = self.line_time(self.segment_lines(middle)[1])
+            if value is None or value <= seconds:
+                low = middle + 1
+            else:
+                high = middle
+        k = max(low - 1, 0)
+        line, data = self.segment_lines(k)
+        matches = list(TIME_PATTERN.finditer(data))
+        if not matches and k == 0:
+            raise ValueError("This log has no timestamps")
+        for match in matches:
+            hours, minutes, value = match.groups()
+            if int(hours) * 3600 + int(minutes) * 60 + float(value) >= seconds:
+                return line + data.count(b"\n", 0, match.start())
+        return min(line + data.count(b"\n"), max(self.line_count - 1, 0))
+
+
+class CaptureLog(MappedLog):
+    """A capture file: the byte stream is its received payloads in order."""
+
+    def __init__(self, path):
+        self.offsets = array("Q")  # File offset of each segment's first record
+        self.times = array("Q")  # Timestamp (ns since start) of that record
+        self.cache = OrderedDict()
+        self.cache_lock = threading.Lock()
+        self.start_wall = 0.0
+        super().__init__(path)
+
+    def read_header(self):
+        if self.size < HEADER.size:
+            raise ValueError(f"{self.path}: truncated capture header")
+        magic, version, reserved, self.start_wall, start_ns = HEADER.unpack_from(self.mm, 0)
+        if version != CAPTURE_VERSION:
+            raise ValueError(f"{self.path}: not a version {CAPTURE_VERSION} capture file")
+
+    def records(self, offset, end):
+        """Yield (file offset, timestamp, direction, payload start, length) up to end."""
+        mm = self.mm
+        unpack_from = RECORD.unpack_from
+        while offset + RECORD.size <= end:
+            timestamp, direction, length = unpack_from(mm, offset)
+            payload = offset + RECORD.size
+            if payload + length > self.size:
+                return  # Cut short while it was being written
+            yield offset, timestamp, direction, payload, length
+            offset = payload + length
+
+    def scan(self):
+        mm = self.mm
+        stream = 0
+        segment_start = None
+        parts = []
+        boundary = HEADER.size
+        for offset, timestamp, direction, payload, length in self.records(HEADER.size, self.size):
+            if offset >= boundary:
+                if segment_start is not None:
+                    self.indexed_bytes = offset
+                    yield segment_start, b"".join(parts)
+                    parts = []
+                self.offsets.append(offset)
+                self.times.append(timestamp)
+                segment_start = stream
+                boundary = offset + SEGMENT_SIZE
+            if direction == RX:
+                parts.append(mm[payload:payload + length])
+                stream += length
+        if segment_start is not None:
+            yield segment_start, b"".join(parts)
+        self.indexed_bytes = self.size
+
+    def segment_bytes(self, k):
+        with self.cache_lock:
+            data = self.cache.get(k)
+            if data is not None:
+                self.cache.move_to_end(k)
+                return data
+        end = self.offsets[k + 1] if k + 1 < self.segments else self.size
+        mm = self.mm
+        data = b"".join(mm[payload:payload + length]
+                        for offset, timestamp, direction, payload, length in self.records(self.offsets[k], end)
+                        if direction == RX)
+        with self.cache_lock:
+            self.cache[k] = data
+            if len(self.cache) > SEGMENT_CACHE:
+                self.cache.popitem(last=False)
+        return data
+
+    def decode(self, raw):
+        return decode_line(raw)[:MAX_DISPLAY_CHARS]
+
+    def find_time(self, job, relative, seconds):
+        if not relative:
+            # A time of day on or after the day the capture started
+            started = time.localtime(self.start_wall)
+            start_of_day = started.tm_hour * 3600 + started.tm_min * 60 + started.tm_sec
+            seconds -= start_of_day + self.start_wall % 1
+            if seconds < 0:
+                # Within the starting second, or else past midnight
+                seconds = 0 if seconds > -1 else seconds + 86400
+        if not self.segments:
+            return 0
+        target = int(seconds * 1e9)
+        k = max(bisect_right(self.times, target, 0, self.segments) - 1, 0)
+        end = self.offsets[k + 1] if k + 1 < self.segments else self.size
+        stream = self.starts[k]
+        for offset, timestamp, direction, payload, length in self.records(self.offsets[k], end):
+            if timestamp >= target:
+                break
+            if direction == RX:
+                stream += length
+        return self.line_number(min(stream, max(self.stream_size - 1, 0)))
+
+    def time_of(self, line):
+        """Return the wall-clock time of the record holding the start of line."""
+        offset = self.line_offset(line)
+        k = max(bisect_right(self.starts, offset, 0, self.segments) - 1, 0)
+        if not self.segments:
+            return self.start_wall
+        end = self.offsets[k + 1] if k + 1 < self.segments else self.size
+        stream = self.starts[k]
+        found = self.times[k]
+        for record_offset, timestamp, direction, payload, length in self.records(self.offsets[k], end):
+            if direction == RX:
+                if stream + length > offset:
+                    found = timestamp
+                    break
+                stream += length
+        return self.start_wall + found / 1e9
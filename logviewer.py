@@ -0,0 +1,307 @@
+"""Virtualized viewer window for session logs and capture files of any size.
+
+The file is memory-mapped and indexed in the background (see logindex), so
+the window opens at once. The Text widget only ever holds the lines that
+fit on screen; scrolling, searching, filtering and jumping re-render that
+window from the index, and the scrollbar stands for the whole file.
+"""
+import os
+import re
+import time
+import tkinter as tk
+from bisect import bisect_left
+from tkinter import ttk
+
+from filters import parse_pattern
+from logindex import open_log, CaptureLog
+
+POLL_INTERVAL_MS = 100  # Progress and index growth are picked up at this rate
+
+
+class LogViewer:
+    """Toplevel window showing one log or capture file."""
+
+    def __init__(self, root, path, on_close=None):
+        self.root = root
+        self.on_close = on_close
+        self.log = open_log(path)
+        self.closed = False
+        self.first = 0  # First visible row (a line number, or an index into the filter)
+        self.rows = 40
+        self.filtered = None
+        self.filter_job = None
+        self.job = None  # Search or time jump in progress
+        self.job_is_search = False
+        self.current = None  # Line of the current search match
+        self.search_term = None
+        self.highlight = None
+        self.notice = None  # Error shown in the status line until the next action
+        self.shown = None  # (first, rows, total) last rendered
+
+        self.window = tk.Toplevel(root)
+        self.window.title(f"Log - {os.path.basename(path)}")
+        self.window.columnconfigure(0, weight=1)
+        self.window.rowconfigure(1, weight=1)
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        controls = ttk.Frame(self.window)
+        controls.grid(row=0, column=0, columnspan=2, sticky='ew', padx=5, pady=5)
+        ttk.Label(controls, text="Find:").grid(row=0, column=0)
+        self.find_var = tk.StringVar()
+        find_entry = ttk.Entry(controls, textvariable=self.find_var, width=20)
+        find_entry.grid(row=0, column=1, padx=5)
+        find_entry.bind('<Return>', lambda e: self.search(True))
+        find_entry.bind('<Shift-Return>', lambda e: self.search(False))
+        ttk.Button(controls, text="Next", command=lambda: self.search(True)).grid(row=0, column=2)
+        ttk.Button(controls, text="Prev", command=lambda: self.search(False)).grid(row=0, column=3, padx=(5, 0))
+        ttk.Label(controls, text="Filter:").grid(row=0, column=4, padx=(15, 0))
+        self.filter_var = tk.StringVar()
+        filter_entry = ttk.Entry(controls, textvariable=self.filter_var, width=20)
+        filter_entry.grid(row=0, column=5, padx=5)
+        filter_entry.bind('<Return>', lambda e: self.apply_filter())
+        self.exclude = tk.BooleanVar()
+        ttk.Checkbutton(controls, text="Exclude", variable=self.exclude,
+                        command=self.apply_filter).grid(row=0, column=6)
+        ttk.Button(controls, text="Clear", command=self.clear_filter).grid(row=0, column=7, padx=5)
+        ttk.Label(controls, text="Go to:").grid(row=0, column=8, padx=(15, 0))
+        self.goto_var = tk.StringVar()
+        goto_entry = ttk.Entry(controls, textvariable=self.goto_var, width=12)
+        goto_entry.grid(row=0, column=9, padx=5)
+        goto_entry.bind('<Return>', lambda e: self.go_to())
+        ttk.Button(controls, text="Go", command=self.go_to).grid(row=0, column=10)
+        self.status_label = ttk.Label(controls, text="", anchor='w')
+        self.status_label.grid(row=1, column=0, columnspan=11, sticky='ew', pady=(2, 0))
+
+        self.text = tk.Text(self.window, wrap=tk.NONE, width=120, height=40, font="TkFixedFont")
+        self.text.grid(row=1, column=0, sticky='nsew', padx=(5, 0))
+        self.text.tag_configure("search_hit", background="yellow")
+        self.text.tag_configure("search_current", background="orange")
+        self.text.configure(state=tk.DISABLED)
+        # The scrollbar spans the whole file, not the widget's contents
+        self.scrollbar = ttk.Scrollbar(self.window, orient=tk.VERTICAL, command=self.on_scrollbar)
+        self.scrollbar.grid(row=1, column=1, sticky='ns', padx=(0, 5))
+        xscroll = ttk.Scrollbar(self.window, orient=tk.HORIZONTAL, command=self.text.xview)
+        xscroll.grid(row=2, column=0, sticky='ew', padx=(5, 0), pady=(0, 5))
+        self.text.configure(xscrollcommand=xscroll.set)
+
+        self.text.bind('<Configure>', lambda e: self.on_resize())
+        self.text.bind('<MouseWheel>', self.on_wheel)
+        self.text.bind('<Button-4>', lambda e: self.scroll_to(self.first - 3))
+        self.text.bind('<Button-5>', lambda e: self.scroll_to(self.first + 3))
+        for key, step in (('<Up>', -1), ('<Down>', 1)):
+            self.text.bind(key, lambda e, step=step: self.scroll_to(self.first + step) or "break")
+        self.text.bind('<Prior>', lambda e: self.scroll_to(self.first - self.rows) or "break")
+        self.text.bind('<Next>', lambda e: self.scroll_to(self.first + self.rows) or "break")
+        self.text.bind('<Control-Home>', lambda e: self.scroll_to(0) or "break")
+        self.text.bind('<Control-End>', lambda e: self.scroll_to(self.total()) or "break")
+        self.text.focus_set()
+
+        self.root.after(POLL_INTERVAL_MS, self.poll)
+
+    def total(self):
+        """Number of rows: lines in the file, or lines passing the filter."""
+        return len(self.filtered) if self.filtered is not None else self.log.line_count
+
+    def line_at(self, row):
+        return self.filtered[row] if self.filtered is not None else row
+
+    def scroll_to(self, first):
+        self.first = max(0, min(first, self.total() - self.rows))
+        self.render()
+
+    def on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.scroll_to(int(float(amount) * self.total()))
+        elif unit == "pages":
+            self.scroll_to(self.first + int(amount) * self.rows)
+        else:
+            self.scroll_to(self.first + int(amount))
+
+    def on_wheel(self, event):
+        self.scroll_to(self.first + (-3 if event.delta > 0 else 3))
+
+    def on_resize(self):
+        line_height = self.text.tk.call("font", "metrics", self.text.cget("font"), "-linespace")
+        self.rows = max(1, self.text.winfo_height() // max(int(line_height), 1))
+        self.render()
+
+    def render(self):
+        """Replace the widget's contents with the visible window of lines."""
+        total = self.total()
+        rows = min(self.rows, max(total - self.first, 0))
+        if self.filtered is None:
+            lines = self.log.lines(self.first, rows)
+        else:
+            lines = [text for row in range(self.first, self.first + rows)
+                     for text in self.log.lines(self.filtered[row], 1)]
+        self.text.configure(state=tk.NORMAL)
+        self.text.delete("1.0", tk.END)
+        self.text.insert("1.0", "\n".join(lines))
+        if self.highlight:
+            for row, text in enumerate(lines, 1):
+                for match in self.highlight.finditer(text):
+                    if match.end() > match.start():
+                        tag = "search_current" if self.line_at(self.first + row - 1) == self.current \
+                            else "search_hit"
+                        self.text.tag_add(tag, f"{row}.{match.start()}", f"{row}.{match.end()}")
+        self.text.configure(state=tk.DISABLED)
+        if total:
+            self.scrollbar.set(self.first / total, (self.first + rows) / total)
+        else:
+            self.scrollbar.set(0.0, 1.0)
+        self.shown = (self.first, self.rows, total)
+
+    def show_line(self, line):
+        """Scroll so line is visible, a third of the way down the window."""
+        row = line
+        if self.filtered is not None:
+            row = bisect_left(self.filtered, line)
+        self.scroll_to(row - self.rows // 3)
+
+    def start_job(self, job, search=False):
+        if self.job:
+            self.job.cancel()
+        self.job = job
+        self.job_is_search = search
+
+    def search(self, forward):
+        term = self.find_var.get()
+        if not term:
+            return
+        self.notice = None
+        if term != self.search_term:
+            self.search_term = term
+            self.current = None
+        pattern, regex, ignore_case = parse_pattern(term)
+        try:
+            self.highlight = re.compile(pattern if regex else re.escape(pattern),
+                                        re.IGNORECASE if ignore_case else 0)
+            filtered = self.filtered
+            accept = None
+            if filtered is not None:
+                def accept(line):
+                    index = bisect_left(filtered, line)
+                    return index < len(filtered) and filtered[index] == line
+            if self.current is not None:
+                after = self.current
+            else:
+                after = self.line_at(self.first) - (1 if forward else 0) if self.total() else -1
+            self.start_job(self.log.search(term, after, forward, accept), search=True)
+        except (ValueError, re.error) as e:
+            self.notice = str(e)
+
+    def apply_filter(self):
+        term = self.filter_var.get()
+        if not term:
+            self.clear_filter()
+            return
+        self.notice = None
+        try:
+            job = self.log.filter(term, exclude=self.exclude.get())
+        except ValueError as e:
+            self.notice = str(e)
+            return
+        if self.filter_job:
+            self.filter_job.cancel()
+        # Rows appear as the job finds them
+        self.filter_job = job
+        self.filtered = job.result
+        self.first = 0
+        self.render()
+
+    def clear_filter(self):
+        if self.filter_job:
+            self.filter_job.cancel()
+            self.filter_job = None
+        top = self.line_at(self.first) if self.total() else 0
+        self.filtered = None
+        self.scroll_to(top)
+
+    def go_to(self):
+        """Jump to a line number, or to a time ("HH:MM:SS" or "+SECONDS")."""
+        target = self.goto_var.get().strip()
+        if not target:
+            return
+        self.notice = None
+        if target.isdigit():
+            self.current = None
+            self.show_line(max(int(target) - 1, 0))
+            return
+        try:
+            self.start_job(self.log.jump_to_time(target))
+        except ValueError as e:
+            self.notice = str(e)
+
+    def poll(self):
+        """Pick up index growth, filter results and finished jobs on a fixed timer."""
+        if self.closed:
+            return
+        job = self.job
+        if job and not job.is_running():
+            self.job = None
+            if job.error:
+                self.notice = job.error
+            elif job.result is None:
+                self.notice = f"{job.description}: no match"
+            else:
+                if self.job_is_search:
+                    self.current = job.result
+                self.show_line(job.result)
+        if self.shown != (self.first, self.rows, self.total()):
+            self.render()
+        self.update_status()
+        self.root.after(POLL_INTERVAL_MS, self.poll)
+
+    def update_status(self):
+        log = self.log
+        parts = [f"{log.size / 1e6:,.1f} MB", f"{log.line_count:,} lines"]
+        if not log.done:
+            parts.append(f"indexing {log.progress:.0%}")
+        else:
+            parts.append(f"indexed in {log.elapsed:.2f} s")
+        total = self.total()
+        if total:
+            top = self.line_at(self.first)
+            position = f"line {top + 1:,}"
+            if isinstance(log, CaptureLog):
+                position += " at " + time.strftime("%H:%M:%S", time.localtime(log.time_of(top)))
+            parts.append(position)
+        filter_job = self.filter_job
+        if filter_job:
+            state = f"filter: {total:,} lines"
+            if filter_job.is_running():
+                state += f" ({filter_job.progress:.0%})"
+            elif filter_job.error:
+                state += f" (stopped: {filter_job.error})"
+            parts.append(state)
+        job = self.job
+        if job:
+            parts.append(f"{job.description} {job.progress:.0%}")
+        if self.notice:
+            parts.append(self.notice)
+        failed = self.notice or (filter_job and filter_job.error)
+        self.status_label.configure(text=" | ".join(parts), foreground="red" if failed else "")
+
+    def lift(self):
+        self.window.lift()
+
+    def close(self):
+        """Stop background work, unmap the file and close the window."""
+        self.closed = True
+        for job in (self.job, self.filter_job):
+            if job:
+                job.cancel()
+                job.wait()
+        self.log.close()
+        self.window.destroy()
+        if self.on_close:
+            self.on_close(self)
+
+
+def main(path):
+    """Open the viewer on its own (python main.py --view FILE)."""
+    root = tk.Tk()
+    root.withdraw()
+    viewer = LogViewer(root, path, on_close=lambda viewer: root.destroy())
+    viewer.window.focus_force()
+    root.mainloop()
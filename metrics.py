@@ -0,0 +1,225 @@
+"""Runtime counters, gauges and latency histograms, with periodic export.
+
+Instrumented code holds a reference that is None while instrumentation is
+off, so the hot paths only pay for one attribute load and truth test:
+
+    metrics = self.metrics
+    if metrics:
+        metrics.add("rx_bytes", len(data))
+
+A MetricsExporter appends snapshots to a JSON-lines file and/or serves
+the latest one as JSON on a localhost HTTP port.
+"""
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_DIR = os.path.join(os.path.expanduser("~"), ".serial_chat", "metrics")
+EXPORT_INTERVAL = 1.0
+
+# Histogram bucket i counts values below 2**i microseconds
+HISTOGRAM_BUCKETS = 32
+
+
+class Histogram:
+    """Fixed-size log2 histogram of durations in seconds."""
+
+    __slots__ = ("buckets", "count", "total", "maximum")
+
+    def __init__(self):
+        self.buckets = [0] * HISTOGRAM_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def observe(self, seconds):
+        index = min(int(seconds * 1e6).bit_length(), HISTOGRAM_BUCKETS - 1)
+        self.buckets[index] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.maximum:
+            self.maximum = seconds
+
+    def percentile(self, fraction):
+        """Return the upper bound (seconds) of the bucket holding the given fraction."""
+        target = self.count * fraction
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= target:
+                return min((1 << index) / 1e6, self.maximum)
+        return self.maximum
+
+    def summary(self):
+        """Return count, mean, p50/p90/p99 and max in milliseconds."""
+        if not self.count:
+            return {"count": 0}
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count * 1000,
+            "p50_ms": self.percentile(0.5) * 1000,
+            "p90_ms": self.percentile(0.9) * 1000,
+            "p99_ms": self.percentile(0.99) * 1000,
+            "max_ms": self.maximum * 1000,
+        }
+
+
+class Metrics:
+    """Thread-safe named counters, gauges and histograms for one session."""
+
+    def __init__(self, name=""):
+        self.name = name
+        self.started = time.time()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def add(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set(self, name, value):
+        self.gauges[name] = value
+
+    def observe(self, name, seconds):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def snapshot(self):
+        """Return a JSON-serialisable copy of every metric."""
+        with self.lock:
+            return {
+                "name": self.name,
+                "time": time.time(),
+                "uptime": time.time() - self.started,
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+                "histograms": {name: histogram.summary()
+                               for name, histogram in self.histograms.items()},
+            }
+
+
+def rates(previous, current):
+    """Return per-second counter rates between two snapshots."""
+    if previous is None:
+        return {}
+    elapsed = current["time"] - previous["time"]
+    if elapsed <= 0:
+        return {}
+    before = previous["counters"]
+    return {name: (value - before.get(name, 0)) / elapsed
+            for name, value in current["counters"].items()}
+
+
+def format_snapshot(snapshot, previous=None):
+    """Format a snapshot as text lines for the status panel."""
+    per_second = rates(previous, snapshot)
+    lines = []
+    for name, value in sorted(snapshot["counters"].items()):
+        rate = per_second.get(name)
+        lines.append(f"{name:<22}{value:>14}" + (f"{rate:>12.0f}/s" if rate is not None else ""))
+    for name, value in sorted(snapshot["gauges"].items()):
+        lines.append(f"{name:<22}{value:>14}")
+    for name, summary in sorted(snapshot["histograms"].items()):
+        if summary["count"]:
+            lines.append(f"{name:<22}{summary['count']:>14}  p50 {summary['p50_ms']:.2f} "
+                         f"p99 {summary['p99_ms']:.2f} max {summary['max_ms']:.2f} ms")
+    return lines
+
+
+class MetricsExporter:
+    """Periodically export snapshots of one or more Metrics.
+
+    path appends one JSON object per Metrics per interval; http_port serves
+    {"metrics": [latest snapshots]} at http://127.0.0.1:<port>/.
+    """
+
+    def __init__(self, sources, path=None, http_port=None, interval=EXPORT_INTERVAL):
+        self.sources = list(sources)
+        self.path = path
+        self.interval = interval
+        self.latest = []
+        self.file = None
+        self.server = None
+        self.stop_event = threading.Event()
+        if http_port is not None:
+            self.server = ThreadingHTTPServer(("127.0.0.1", http_port), self.make_handler())
+            self.server.daemon_threads = True
+        if path:
+            try:
+                directory = os.path.dirname(path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self.file = open(path, "a", encoding="utf-8")
+            except OSError:
+                if self.server:
+                    self.server.server_close()
+                raise
+        if self.server:
+            threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    @property
+    def http_port(self):
+        return self.server.server_address[1] if self.server else None
+
+    def make_handler(self):
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = json.dumps({"metrics": exporter.latest or exporter.collect()}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def collect(self):
+        """Snapshot every source, adding counter rates since the previous export."""
+        snapshots = [source.snapshot() for source in self.sources]
+        previous = self.latest if len(self.latest) == len(snapshots) else [None] * len(snapshots)
+        for snapshot, before in zip(snapshots, previous):
+            snapshot["rates"] = rates(before, snapshot)
+        return snapshots
+
+    def export(self):
+        self.latest = self.collect()
+        if self.file:
+            self.file.write("".join(json.dumps(snapshot) + "\n" for snapshot in self.latest))
+            self.file.flush()
+
+    def run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.export()
+            except (OSError, ValueError):
+                break
+
+    def close(self):
+        """Stop exporting, writing one final snapshot to the file."""
+        self.stop_event.set()
+        self.thread.join()
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        if self.file:
+            try:
+                self.export()
+            except (OSError, ValueError):
+                pass
+            self.file.close()
+            self.file = None
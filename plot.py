@@ -0,0 +1,162 @@
+"""Live telemetry plot window for a SerialSession (needs NumPy).
+
+The reader thread only appends samples to the session's Telemetry ring;
+this window redraws on its own fixed timer, decimating the visible window
+to one min/max pair per pixel column, so drawing cost depends on the plot
+width rather than on the sample rate.
+"""
+import time
+import tkinter as tk
+from tkinter import ttk
+
+import numpy as np
+
+from telemetry import Telemetry
+
+PLOT_INTERVAL_MS = 50  # Fixed redraw rate (20 frames/s)
+DEFAULT_WINDOW_SAMPLES = 10000
+PLOT_MARGIN = 50
+CHANNEL_COLORS = ["blue", "red", "green", "orange", "purple", "brown", "magenta", "teal"]
+
+
+class TelemetryPlot:
+    """Toplevel window plotting the numeric fields of a session's received lines."""
+
+    def __init__(self, root, session, on_close=None):
+        self.root = root
+        self.session = session
+        self.on_close = on_close
+        self.telemetry = None
+        self.closed = False
+
+        self.window = tk.Toplevel(root)
+        self.window.title(f"Telemetry - {session.label or 'Serial Chat'}")
+        self.window.columnconfigure(0, weight=1)
+        self.window.rowconfigure(1, weight=1)
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        controls = ttk.Frame(self.window)
+        controls.grid(row=0, column=0, sticky='ew', padx=5, pady=5)
+        ttk.Label(controls, text="Format:").grid(row=0, column=0)
+        self.spec_var = tk.StringVar(value="kv")
+        spec_entry = ttk.Entry(controls, textvariable=self.spec_var, width=20)
+        spec_entry.grid(row=0, column=1, padx=5)
+        spec_entry.bind('<Return>', lambda e: self.apply())
+        ttk.Button(controls, text="Apply", command=self.apply).grid(row=0, column=2)
+        ttk.Label(controls, text="Window (samples):").grid(row=0, column=3, padx=(10, 0))
+        self.samples_var = tk.StringVar(value=str(DEFAULT_WINDOW_SAMPLES))
+        ttk.Entry(controls, textvariable=self.samples_var, width=8).grid(row=0, column=4, padx=5)
+        ttk.Button(controls, text="Clear", command=self.clear).grid(row=0, column=5)
+        self.status_label = ttk.Label(controls, text="kv, kv:key1,key2, csv or csv:name1,name2")
+        self.status_label.grid(row=1, column=0, columnspan=6, sticky='w', pady=(2, 0))
+
+        self.canvas = tk.Canvas(self.window, width=700, height=300, background="white")
+        self.canvas.grid(row=1, column=0, sticky='nsew', padx=5, pady=(0, 5))
+        # Canvas items are created once and only moved on each frame
+        self.lines = [self.canvas.create_line(0, 0, 0, 0, fill=color, state=tk.HIDDEN)
+                      for color in CHANNEL_COLORS]
+        self.axis = self.canvas.create_rectangle(0, 0, 0, 0, outline="gray")
+        self.top_label = self.canvas.create_text(0, 0, anchor='ne', fill="gray")
+        self.bottom_label = self.canvas.create_text(0, 0, anchor='se', fill="gray")
+        self.span_label = self.canvas.create_text(0, 0, anchor='nw', fill="gray")
+        self.legend = [self.canvas.create_text(0, 0, anchor='nw', fill=color)
+                       for color in CHANNEL_COLORS]
+
+        self.apply()
+        self.root.after(PLOT_INTERVAL_MS, self.redraw)
+
+    def apply(self):
+        """Start parsing with the format in the entry, discarding the old samples."""
+        try:
+            telemetry = Telemetry(self.spec_var.get())
+        except ValueError as e:
+            self.status_label.configure(text=str(e), foreground="red")
+            return
+        self.telemetry = telemetry
+        self.session.telemetry = telemetry
+        self.status_label.configure(text="", foreground="")
+
+    def clear(self):
+        if self.telemetry:
+            self.telemetry.clear()
+
+    def window_samples(self):
+        try:
+            return max(2, int(self.samples_var.get()))
+        except ValueError:
+            return DEFAULT_WINDOW_SAMPLES
+
+    def redraw(self):
+        """Draw one frame and schedule the next one at the fixed frame rate."""
+        if self.closed:
+            return
+        started = time.perf_counter()
+        telemetry = self.telemetry
+        if telemetry:
+            self.draw(telemetry)
+        elapsed_ms = int((time.perf_counter() - started) * 1000)
+        self.root.after(max(1, PLOT_INTERVAL_MS - elapsed_ms), self.redraw)
+
+    def draw(self, telemetry):
+        canvas = self.canvas
+        width = canvas.winfo_width()
+        height = canvas.winfo_height()
+        left, top = PLOT_MARGIN, 10
+        right, bottom = width - 10, height - 20
+        plot_width = max(right - left, 2)
+        plot_height = max(bottom - top, 2)
+        canvas.coords(self.axis, left, top, right, bottom)
+
+        names, minimums, maximums, span = telemetry.window(self.window_samples(), plot_width)
+        columns = len(minimums)
+        if columns:
+            low = np.nanmin(minimums) if not np.isnan(minimums).all() else 0.0
+            high = np.nanmax(maximums) if not np.isnan(maximums).all() else 1.0
+        else:
+            low, high = 0.0, 1.0
+        if high - low < 1e-12:
+            low, high = low - 0.5, high + 0.5
+        scale = plot_height / (high - low)
+        x = left + np.arange(columns) * (plot_width / max(columns - 1, 1))
+        latest, _ = telemetry.latest(1)
+
+        for channel, (line, legend) in enumerate(zip(self.lines, self.legend)):
+            if channel >= len(names):
+                canvas.itemconfigure(line, state=tk.HIDDEN)
+                canvas.itemconfigure(legend, text="")
+                continue
+            valid = ~np.isnan(minimums[:, channel])
+            if valid.sum() < 2:
+                canvas.itemconfigure(line, state=tk.HIDDEN)
+            else:
+                # One zig-zag polyline through each column's min and max
+                points = np.empty((int(valid.sum()), 4))
+                points[:, 0] = points[:, 2] = x[valid]
+                points[:, 1] = bottom - (minimums[valid, channel] - low) * scale
+                points[:, 3] = bottom - (maximums[valid, channel] - low) * scale
+                canvas.coords(line, points.ravel().tolist())
+                canvas.itemconfigure(line, state=tk.NORMAL)
+            value = latest[0, channel] if len(latest) else np.nan
+            canvas.coords(legend, left + 5 + channel * 90, top + 2)
+            canvas.itemconfigure(legend, text=f"{names[channel]}={value:.4g}")
+
+        canvas.coords(self.top_label, left - 4, top)
+        canvas.itemconfigure(self.top_label, text=f"{high:.4g}")
+        canvas.coords(self.bottom_label, left - 4, bottom)
+        canvas.itemconfigure(self.bottom_label, text=f"{low:.4g}")
+        canvas.coords(self.span_label, left, bottom + 3)
+        canvas.itemconfigure(self.span_label,
+                             text=f"{span:.1f} s | {telemetry.count} samples | "
+                                  f"{telemetry.skipped} lines without numbers")
+
+    def lift(self):
+        self.window.lift()
+
+    def close(self):
+        """Stop parsing telemetry and close the window."""
+        self.closed = True
+        if self.session.telemetry is self.telemetry:
+            self.session.telemetry = None
+        self.window.destroy()
+        if self.on_close:
+            self.on_close()
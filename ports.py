@@ -0,0 +1,215 @@
+"""Serial port enumeration with hot-plug detection."""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from types import MappingProxyType
+
+import serial.tools.list_ports
+
+# Fallback polling interval when inotify is unavailable (non-Linux platforms)
+POLL_INTERVAL = 2.0
+# Safety rescan interval while inotify is active, in case an event was missed
+RESCAN_INTERVAL = 30.0
+# Delay after a /dev event so udev can finish creating nodes and symlinks
+SETTLE_DELAY = 0.25
+
+WATCH_PATHS = ("/dev", "/dev/serial/by-id")
+# /dev entries (and by-id symlinks) whose creation or removal triggers a rescan
+DEVICE_PREFIXES = ("tty", "cu.", "rfcomm", "serial", "by-id", "usb-")
+
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_ATTRIB = 0x00000004
+IN_IGNORED = 0x00008000  # The watch was removed, e.g. because its directory was deleted
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_ATTRIB
+EVENT_HEADER = struct.Struct("iIII")
+
+
+def describe_port(port):
+    """Return the combobox label used for a port."""
+    description = f"{port.device}"
+    if port.description:
+        description += f" - {port.description}"
+    return description
+
+
+def port_details(port):
+    """Return the information dict stored for a port."""
+    return {
+        'device': port.device,
+        'name': port.name,
+        'description': port.description,
+        'hwid': port.hwid,
+        'vid': port.vid,
+        'pid': port.pid,
+        'serial_number': port.serial_number,
+        'manufacturer': port.manufacturer,
+        'product': port.product,
+    }
+
+
+def is_serial_device(device):
+    """Return True for devices worth offering in the port list."""
+    # Windows: COM ports
+    if sys.platform.startswith('win'):
+        return 'COM' in device
+    # Linux/Unix: tty devices
+    device = device.lower()
+    return 'tty' in device and ('acm' in device or 'usb' in device)
+
+
+def scan_ports():
+    """Enumerate ports and return a {description: info} dict."""
+    return {describe_port(port): port_details(port)
+            for port in serial.tools.list_ports.comports()}
+
+
+class Inotify:
+    """Minimal ctypes wrapper around Linux inotify for watching /dev."""
+    
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.add_watch = libc.inotify_add_watch
+        self.add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self.fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watched = {}  # Watch descriptor -> path
+        self.watch_paths()
+    
+    def watch_paths(self):
+        """Add watches for any watch path that exists and is not yet watched."""
+        watched = set(self.watched.values())
+        for path in WATCH_PATHS:
+            if path not in watched and os.path.isdir(path):
+                wd = self.add_watch(self.fd, path.encode(), WATCH_MASK)
+                if wd >= 0:
+                    self.watched[wd] = path
+    
+    def read_names(self):
+        """Drain pending events and return the file names they refer to."""
+        names = []
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return names
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                if mask & IN_IGNORED:
+                    # udev removes /dev/serial/by-id with the last USB serial
+                    # device; forget the watch so watch_paths() adds it again
+                    path = self.watched.pop(wd, None)
+                    if path:
+                        names.append(os.path.basename(path))
+                else:
+                    names.append(data[offset:offset + length].rstrip(b"\0").decode(errors="replace"))
+                offset += length
+    
+    def close(self):
+        os.close(self.fd)
+
+
+class PortWatcher:
+    """Publish immutable port snapshots and add/remove diffs as devices come and go.
+    
+    on_change(snapshot, added, removed) is called from the watcher thread only
+    when the set of ports actually changed. The current snapshot is also
+    available as the snapshot attribute, which is replaced atomically.
+    """
+    
+    def __init__(self, on_change=None):
+        self.on_change = on_change
+        self.snapshot = MappingProxyType({})
+        self.running = False
+        self.thread = None
+        self.wake_r, self.wake_w = os.pipe()
+        self.lock = threading.Lock()  # Keeps stop() from writing to a closed pipe
+    
+    def start(self):
+        """Take an initial snapshot and start watching in a background thread."""
+        self.running = True
+        self.thread = threading.Thread(target=self.watch_loop, daemon=True)
+        self.thread.start()
+    
+    def stop(self):
+        """Stop the watcher thread, which closes the wake-up pipe on its way out.
+        
+        The thread is not joined: its on_change callback may be waiting on
+        the caller (e.g. the Tk main loop).
+        """
+        with self.lock:
+            self.running = False
+            if self.thread is None:
+                self.close_pipe()
+            elif self.wake_w is not None:
+                os.write(self.wake_w, b"\0")
+    
+    def close_pipe(self):
+        """Close both ends of the wake-up pipe (called with the lock held)."""
+        if self.wake_r is not None:
+            os.close(self.wake_r)
+            os.close(self.wake_w)
+            self.wake_r = None
+            self.wake_w = None
+    
+    def refresh(self):
+        """Rescan ports and publish a new snapshot if anything changed."""
+        ports = scan_ports()
+        old = self.snapshot
+        added = tuple(name for name in ports if old.get(name) != ports[name])
+        removed = tuple(name for name in old if name not in ports)
+        if not added and not removed:
+            return
+        self.snapshot = MappingProxyType(ports)
+        if self.on_change:
+            self.on_change(self.snapshot, added, removed)
+    
+    def watch_loop(self):
+        """Wait for /dev events (or poll) and rescan ports when they occur."""
+        inotify = None
+        if sys.platform.startswith('linux'):
+            try:
+                inotify = Inotify()
+            except (OSError, AttributeError):
+                inotify = None
+        
+        try:
+            self.refresh()
+            while self.running:
+                if inotify is None:
+                    ready, _, _ = select.select([self.wake_r], [], [], POLL_INTERVAL)
+                    if self.wake_r not in ready:
+                        self.refresh()
+                    continue
+                
+                ready, _, _ = select.select([inotify.fd, self.wake_r], [], [], RESCAN_INTERVAL)
+                if self.wake_r in ready:
+                    continue
+                if not ready:
+                    inotify.watch_paths()
+                    self.refresh()
+                    continue
+                
+                names = inotify.read_names()
+                if any(name.startswith(DEVICE_PREFIXES) for name in names):
+                    time.sleep(SETTLE_DELAY)
+                    inotify.read_names()
+                    inotify.watch_paths()
+                    self.refresh()
+        finally:
+            if inotify is not None:
+                inotify.close()
+            with self.lock:
+                self.close_pipe()
@@ -0,0 +1,142 @@
+"""Auto-reconnect scheduling with exponential backoff."""
+import random
+import threading
+import time
+
+RECONNECT_BASE_DELAY = 0.25
+RECONNECT_MAX_DELAY = 10.0
+RECONNECT_JITTER = 0.25  # Delays vary by +/- this fraction
+
+
+def port_identity(info):
+    """Return the (vid, pid, serial_number) triple used to recognise a device."""
+    return info['vid'], info['pid'], info['serial_number']
+
+
+def find_matching_port(snapshot, identity):
+    """Return the snapshot key of the port matching identity, or None.
+    
+    The serial number is compared whenever the target has one, so several
+    boards sharing a VID/PID are never cross-connected.
+    """
+    vid, pid, serial_number = identity
+    for description, info in snapshot.items():
+        if info['vid'] != vid or info['pid'] != pid:
+            continue
+        if serial_number and info['serial_number'] != serial_number:
+            continue
+        return description
+    return None
+
+
+class ReconnectScheduler:
+    """Retry a lost device with backoff, keeping at most one attempt in flight.
+    
+    find_port(identity) returns a port key or None and must be cheap (it reads
+    the port watcher's snapshot). attempt(key) starts a connection attempt and
+    the owner reports the outcome through attempt_finished(). A start() that
+    arrives while an attempt is in flight (the reopened port failed at once)
+    is remembered and honoured when that attempt finishes.
+    """
+    
+    def __init__(self, find_port, attempt):
+        self.find_port = find_port
+        self.attempt = attempt
+        self.identity = None
+        self.active = False
+        self.in_flight = False
+        self.restart_requested = False
+        self.backing_off = False
+        self.delay = RECONNECT_BASE_DELAY
+        self.attempts = 0
+        self.lost_at = None
+        self.wake = threading.Event()
+        self.lock = threading.Lock()
+        self.thread = None  # Started on first use so idle sessions cost no thread
+    
+    def start(self, identity):
+        """Begin reconnecting to the device with the given identity."""
+        with self.lock:
+            if self.active:
+                if self.in_flight:
+                    self.identity = identity
+                    self.restart_requested = True
+                return
+            self.identity = identity
+            self.active = True
+            self.in_flight = False
+            self.backing_off = False
+            self.delay = RECONNECT_BASE_DELAY
+            self.attempts = 0
+            self.lost_at = time.monotonic()
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+        self.wake.set()
+    
+    def stop(self):
+        """Give up reconnecting."""
+        with self.lock:
+            self.active = False
+            self.in_flight = False
+            self.restart_requested = False
+    
+    def notify_hotplug(self):
+        """Retry immediately because a port just appeared."""
+        with self.lock:
+            self.delay = RECONNECT_BASE_DELAY
+            self.backing_off = False
+        self.wake.set()
+    
+    def attempt_finished(self, success):
+        """Record the outcome of an attempt; returns the latency in seconds on success."""
+        latency = None
+        with self.lock:
+            self.in_flight = False
+            restart = self.restart_requested
+            self.restart_requested = False
+            if success:
+                latency = time.monotonic() - self.lost_at
+                if not restart:
+                    self.active = False
+                    return latency
+                # Lost again straight after reopening: start over, keeping the
+                # backoff so a device that keeps failing is not hammered
+                self.attempts = 0
+                self.lost_at = time.monotonic()
+            self.backing_off = True
+        self.wake.set()
+        return latency
+    
+    def next_delay(self):
+        return self.delay * random.uniform(1 - RECONNECT_JITTER, 1 + RECONNECT_JITTER)
+    
+    def run(self):
+        """Scheduler thread: sleep until woken or the backoff expires, then try once."""
+        timeout = None
+        while True:
+            self.wake.wait(timeout)
+            self.wake.clear()
+            
+            with self.lock:
+                if not self.active:
+                    timeout = None  # Idle until start() is called
+                    continue
+                if self.in_flight:
+                    timeout = None  # attempt_finished() wakes us
+                    continue
+                if self.backing_off:
+                    # The last attempt failed; wait out the backoff first
+                    self.backing_off = False
+                    timeout = self.next_delay()
+                    self.delay = min(self.delay * 2, RECONNECT_MAX_DELAY)
+                    continue
+                key = self.find_port(self.identity)
+                if key is None:
+                    timeout = self.next_delay()
+                    self.delay = min(self.delay * 2, RECONNECT_MAX_DELAY)
+                    continue
+                self.in_flight = True
+                self.attempts += 1
+                timeout = None
+            self.attempt(key)
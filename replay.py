@@ -0,0 +1,164 @@
+"""Replay capture files through a pseudo-terminal (POSIX only).
+
+The received side of a capture is written to the master end of an
+os.openpty() pair, so the monitor (or any other program) can open the
+slave device exactly like a real serial port. Playback starts once a
+client has opened the device:
+
+    python replay.py ~/.serial_chat/captures/capture-20240101-120000.scap --speed 10
+"""
+import argparse
+import os
+import select
+import sys
+import threading
+import time
+import tty
+
+from capture import CaptureReader, RX
+
+
+class Replayer:
+    """Stream the rx records of one or more capture files through a pty.
+    
+    speed scales the original timing (2.0 plays twice as fast); a speed of 0
+    writes as fast as the pty accepts data. start skips that many seconds
+    past the start of the first file; rotated files that end before that
+    point are skipped whole, using the start time in each file's header.
+    """
+    
+    def __init__(self, paths, speed=1.0, start=0.0):
+        self.paths = paths
+        self.speed = speed
+        self.start = start
+        self.master_fd, slave_fd = os.openpty()
+        tty.setraw(slave_fd)
+        self.device = os.ttyname(slave_fd)
+        # Close our slave end so the master reports POLLHUP until a client opens it
+        os.close(slave_fd)
+        self.poller = select.poll()
+        self.poller.register(self.master_fd, select.POLLIN)
+        self.running = False
+        self.thread = None
+        self.bytes_sent = 0
+    
+    def start_thread(self):
+        """Run the replay in a background thread."""
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+    
+    def stop(self):
+        self.running = False
+    
+    def close(self):
+        """Stop and release the pty."""
+        self.running = False
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join()
+        os.close(self.master_fd)
+    
+    def client_connected(self):
+        """Return True while some process has the slave device open."""
+        return not any(events & select.POLLHUP for fd, events in self.poller.poll(0))
+    
+    def wait_for_client(self, connected=True):
+        """Block until a client has opened (or, with connected=False, closed) the device."""
+        while self.running and self.client_connected() != connected:
+            time.sleep(0.05)
+    
+    def drain_input(self):
+        """Discard anything the client wrote so it never blocks on a full pty."""
+        while select.select([self.master_fd], [], [], 0)[0]:
+            try:
+                if not os.read(self.master_fd, 65536):
+                    return
+            except OSError:
+                return
+    
+    def send(self, data):
+        """Write all of data to the pty master."""
+        view = memoryview(data)
+        while view and self.running:
+            writable = select.select([self.master_fd], [self.master_fd], [], 0.1)
+            if self.master_fd in writable[0]:
+                self.drain_input()
+            if self.master_fd in writable[1]:
+                written = os.write(self.master_fd, view)
+                view = view[written:]
+                self.bytes_sent += written
+    
+    def run(self):
+        """Play every file in order, keeping timing continuous across rotations."""
+        self.running = True
+        self.wait_for_client()
+        # Give the client a moment to finish configuring the port (pyserial
+        # flushes the input buffer on open)
+        time.sleep(0.1)
+        origin = None
+        target = None  # Monotonic time to start from, in the capture's clock
+        started = time.monotonic()
+        for number, path in enumerate(self.paths):
+            reader = CaptureReader(path)
+            try:
+                if self.start and target is None:
+                    target = reader.start_ns + int(self.start * 1e9)
+                skip_before = 0
+                if target is not None and target > reader.start_ns:
+                    if number + 1 < len(self.paths) and file_start_ns(self.paths[number + 1]) <= target:
+                        continue  # The next file starts before the target, so this one ends before it
+                    skip_before = target - reader.start_ns
+                    reader.seek_time(skip_before / 1e9)
+                for timestamp, direction, data in reader.records():
+                    if not self.running:
+                        return
+                    if direction != RX or timestamp < skip_before:
+                        continue
+                    moment = reader.start_ns + timestamp
+                    if origin is None:
+                        origin = moment
+                    if self.speed:
+                        delay = started + (moment - origin) / 1e9 / self.speed - time.monotonic()
+                        if delay > 0:
+                            time.sleep(delay)
+                    self.send(data)
+            finally:
+                reader.close()
+        self.running = False
+
+
+def file_start_ns(path):
+    """Return the monotonic start time recorded in a capture file's header."""
+    reader = CaptureReader(path)
+    reader.close()
+    return reader.start_ns
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay serial captures through a pseudo-terminal.")
+    parser.add_argument("captures", nargs="+", help="capture file(s), played in order")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="playback speed multiplier (default: original timing)")
+    parser.add_argument("--fast", action="store_true", help="play as fast as possible")
+    parser.add_argument("--start", type=float, default=0.0,
+                        help="seconds to skip from the start of the first capture")
+    args = parser.parse_args()
+    
+    replayer = Replayer(args.captures, speed=0 if args.fast else args.speed, start=args.start)
+    print(f"Replaying on {replayer.device} once a client opens it", flush=True)
+    started = time.monotonic()
+    try:
+        replayer.run()
+        # Keep the pty open until the client has drained it and closed the device
+        replayer.running = True
+        replayer.wait_for_client(connected=False)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        elapsed = time.monotonic() - started
+        print(f"Sent {replayer.bytes_sent} bytes in {elapsed:.1f} s", file=sys.stderr)
+        replayer.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+"""Expect-style scripted sessions with command/response latency statistics.
+
+A script is a text file with one step per line:
+
+    # Check that every AT command is answered within 500 ms
+    timeout 0.5
+    loop 1000
+        send AT
+        expect /^OK$/
+    end
+    send 0x01 02 03
+    expect ACK
+    delay 0.1
+
+send takes the same input as the message entry (";"-separated commands,
+0x-prefixed hex). expect waits for a received line matching literal text
+or /regex/ (/regex/i ignores case) and fails after the current timeout.
+loop N ... end repeats the enclosed steps; loops can be nested.
+
+A ScriptRunner executes a script on its own thread. Writes bypass the
+normal send pacing, and the latency of each expect is measured from the
+start of the preceding write to the read of the chunk holding the first
+matching line.
+"""
+import re
+import threading
+import time
+from collections import deque
+
+from filters import parse_pattern
+from metrics import Histogram
+from session import parse_commands
+from writer import SendItem, DEFAULT_WRITE_TIMEOUT
+
+DEFAULT_EXPECT_TIMEOUT = 1.0
+LINE_BUFFER = 10000  # Received lines held for the expect in progress
+
+
+class Send:
+    def __init__(self, items, source):
+        self.items = items
+        self.source = source
+
+
+class Expect:
+    """An expect step and the results collected for it."""
+
+    def __init__(self, pattern, source, timeout, after):
+        self.pattern = pattern
+        self.source = source
+        self.timeout = timeout
+        self.after = after  # Label of the send it answers, for reports
+        self.passed = 0
+        self.failed = 0
+        self.latencies = []
+        self.histogram = Histogram()
+
+    def label(self):
+        return f"{self.after} -> {self.source}" if self.after else self.source
+
+
+class Delay:
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+
+class Loop:
+    def __init__(self, count, steps):
+        self.count = count
+        self.steps = steps
+
+
+def parse_script(text):
+    """Parse a script into a list of steps; errors name the offending line."""
+    root = []
+    stack = [(root, None)]
+    timeout = DEFAULT_EXPECT_TIMEOUT
+    last_send = None
+    for number, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        command, _, argument = line.partition(" ")
+        command = command.lower()
+        argument = argument.strip()
+        steps = stack[-1][0]
+        try:
+            if command == "send":
+                items = parse_commands(argument)
+                if not items:
+                    raise ValueError("send needs something to send")
+                steps.append(Send(items, argument))
+                last_send = argument
+            elif command == "expect":
+                if not argument:
+                    raise ValueError("expect needs a pattern")
+                pattern, regex, ignore_case = parse_pattern(argument)
+                try:
+                    compiled = re.compile(pattern if regex else re.escape(pattern),
+                                          re.IGNORECASE if ignore_case else 0)
+                except re.error as e:
+                    raise ValueError(f"Invalid pattern: {str(e)}") from None
+                steps.append(Expect(compiled, argument, timeout, last_send))
+            elif command == "timeout":
+                timeout = float(argument)
+                if timeout <= 0:
+                    raise ValueError("timeout must be positive")
+            elif command == "delay":
+                steps.append(Delay(max(float(argument), 0.0)))
+            elif command == "loop":
+                count = int(argument)
+                if count < 1:
+                    raise ValueError("loop count must be at least 1")
+                loop = Loop(count, [])
+                steps.append(loop)
+                stack.append((loop.steps, number))
+            elif command == "end":
+                if len(stack) == 1:
+                    raise ValueError("end without loop")
+                stack.pop()
+            else:
+                raise ValueError(f"Unknown step: {command}")
+        except ValueError as e:
+            raise ValueError(f"Line {number}: {str(e)}") from None
+    if len(stack) > 1:
+        raise ValueError(f"Line {stack[-1][1]}: loop without end")
+    return root
+
+
+def expect_steps(steps):
+    """Yield every Expect in a step list, including those inside loops."""
+    for step in steps:
+        if isinstance(step, Expect):
+            yield step
+        elif isinstance(step, Loop):
+            yield from expect_steps(step.steps)
+
+
+class ScriptRunner:
+    """Run a parsed script against a connected SerialSession on a background thread.
+
+    on_finish(runner) is called from the script thread when it ends;
+    runner.error is set if it stopped early.
+    """
+
+    def __init__(self, session, steps, on_finish=None):
+        self.session = session
+        self.steps = steps
+        self.on_finish = on_finish
+        self.lines = deque(maxlen=LINE_BUFFER)
+        self.condition = threading.Condition()
+        self.stopped = threading.Event()
+        self.written = threading.Event()
+        self.write_error = None
+        self.sent_at = None
+        self.error = None
+        self.started = None
+        self.elapsed = 0.0
+        self.iterations = 0
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Abort the script at the next step or wait."""
+        self.stopped.set()
+        self.written.set()
+        with self.condition:
+            self.condition.notify_all()
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def wait(self, timeout=None):
+        if self.thread:
+            self.thread.join(timeout)
+
+    def notify_lines(self, texts, received_at):
+        """Called by the reader with decoded lines and the time they were read."""
+        with self.condition:
+            self.lines.extend((received_at, text) for text in texts)
+            self.condition.notify()
+
+    def on_written(self, item, error):
+        self.write_error = error
+        self.written.set()
+
+    def run(self):
+        self.session.script = self
+        self.started = time.perf_counter()
+        try:
+            self.execute(self.steps)
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            self.session.script = None
+            self.elapsed = time.perf_counter() - self.started
+            if self.stopped.is_set() and not self.error:
+                self.error = "Stopped"
+        if self.on_finish:
+            self.on_finish(self)
+
+    def execute(self, steps):
+        for step in steps:
+            if self.stopped.is_set():
+                return
+            if isinstance(step, Send):
+                self.send(step)
+            elif isinstance(step, Expect):
+                self.expect(step)
+            elif isinstance(step, Delay):
+                self.stopped.wait(step.seconds)
+            else:
+                for _ in range(step.count):
+                    self.execute(step.steps)
+                    if self.stopped.is_set():
+                        return
+                    self.iterations += 1
+
+    def send(self, step):
+        """Write a send step's commands one after another and wait for each write."""
+        with self.condition:
+            # Only replies to this send count for the following expect
+            self.lines.clear()
+        for item in step.items:
+            item = SendItem(item.data, item.label, paced=False, on_done=self.on_written)
+            self.written.clear()
+            if not self.session.send([item]):
+                raise RuntimeError("Not connected" if not self.session.is_connected
+                                   else "Send queue is full")
+            if not self.written.wait(DEFAULT_WRITE_TIMEOUT + 1.0):
+                raise RuntimeError(f"Write did not complete: {item.label}")
+            if self.stopped.is_set():
+                return
+            if self.write_error:
+                raise RuntimeError(f"{self.write_error}: {item.label}")
+            self.sent_at = item.sent_at
+
+    def expect(self, step):
+        """Wait for a line matching step.pattern and record its latency."""
+        started = time.perf_counter()
+        reference = self.sent_at if self.sent_at is not None else started
+        deadline = started + step.timeout
+        search = step.pattern.search
+        lines = self.lines
+        with self.condition:
+            while not self.stopped.is_set():
+                while lines:
+                    received_at, text = lines.popleft()
+                    if search(text):
+                        latency = max(received_at - reference, 0.0)
+                        step.passed += 1
+                        step.latencies.append(latency)
+                        step.histogram.observe(latency)
+                        self.sent_at = None
+                        return
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    step.failed += 1
+                    self.sent_at = None
+                    return
+                self.condition.wait(remaining)
+
+    def passed(self):
+        """True if the script ran to completion and every expect matched."""
+        return self.error is None and all(not step.failed for step in expect_steps(self.steps))
+
+    def results(self):
+        """Return per-expect results as JSON-serialisable dicts (times in ms)."""
+        results = []
+        for step in expect_steps(self.steps):
+            ordered = sorted(step.latencies)
+            last = len(ordered) - 1
+            result = {"step": step.label(), "passed": step.passed, "failed": step.failed}
+            if ordered:
+                result.update({
+                    "min_ms": ordered[0] * 1000,
+                    "p50_ms": ordered[last * 50 // 100] * 1000,
+                    "p90_ms": ordered[last * 90 // 100] * 1000,
+                    "p99_ms": ordered[last * 99 // 100] * 1000,
+                    "max_ms": ordered[last] * 1000,
+                    "histogram": {f"<{(1 << index) / 1000:g}ms": count
+                                  for index, count in enumerate(step.histogram.buckets) if count},
+                })
+            results.append(result)
+        return results
+
+    def report(self):
+        """Return the results as text lines."""
+        status = "PASS" if self.passed() else "FAIL"
+        lines = [f"Script {status} in {self.elapsed:.2f} s ({self.iterations} loop iterations)"
+                 + (f": {self.error}" if self.error else "")]
+        for result in self.results():
+            line = f"{result['step']}: {result['passed']} passed, {result['failed']} failed"
+            if result["passed"]:
+                line += (f" | min {result['min_ms']:.2f} p50 {result['p50_ms']:.2f} "
+                         f"p90 {result['p90_ms']:.2f} p99 {result['p99_ms']:.2f} "
+                         f"max {result['max_ms']:.2f} ms")
+            lines.append(line)
+            for bucket, count in result.get("histogram", {}).items():
+                lines.append(f"    {bucket:>12} {count:>8}")
+        return lines
@@ -0,0 +1,95 @@
+"""Incremental search over the lines held by the chat scrollback."""
+import re
+from bisect import bisect_left
+
+
+class SearchIndex:
+    """Sorted match list for the active search term, kept in sync with the scrollback.
+    
+    Matches are stored as (absolute line, start column, end column) tuples, so
+    lines trimmed from the top of the display never renumber the remaining ones.
+    """
+    
+    def __init__(self):
+        self.term = None
+        self.regex = False
+        self.case = False
+        self.pattern = None
+        self.matches = []
+        self.current = -1
+    
+    def __len__(self):
+        return len(self.matches)
+    
+    def is_active(self):
+        return self.pattern is not None
+    
+    def options_changed(self, term, regex, case):
+        """Return True if the given search options differ from the active ones."""
+        return (term, regex, case) != (self.term, self.regex, self.case)
+    
+    def set_term(self, term, lines, first, regex=False, case=False):
+        """Compile a new search term and index the given lines (raises re.error)."""
+        self.reset()
+        if not term:
+            return
+        flags = 0 if case else re.IGNORECASE
+        self.pattern = re.compile(term if regex else re.escape(term), flags)
+        self.term = term
+        self.regex = regex
+        self.case = case
+        self.add_lines(lines, first)
+    
+    def reset(self):
+        """Drop the active term and all matches."""
+        self.term = None
+        self.pattern = None
+        self.matches = []
+        self.current = -1
+    
+    def add_lines(self, lines, first):
+        """Index lines appended to the scrollback, starting at absolute line first."""
+        if self.pattern is None:
+            return 0
+        search = self.pattern.search
+        finditer = self.pattern.finditer
+        matches = self.matches
+        added = len(matches)
+        for number, line in enumerate(lines, first):
+            if search(line):
+                matches.extend((number, m.start(), m.end())
+                               for m in finditer(line) if m.end() > m.start())
+        return len(matches) - added
+    
+    def trim(self, first):
+        """Forget matches on lines before absolute line first."""
+        count = bisect_left(self.matches, (first,))
+        if count:
+            del self.matches[:count]
+            self.current = max(self.current - count, -1)
+        return count
+    
+    def step(self, forward=True, from_line=None):
+        """Move to the next or previous match and return it, or None if there are none.
+        
+        With no current match the search starts at from_line (e.g. the first
+        visible line), located with a binary search.
+        """
+        if not self.matches:
+            self.current = -1
+            return None
+        if self.current < 0 and from_line is not None:
+            position = bisect_left(self.matches, (from_line,))
+            self.current = position if forward else position - 1
+        elif forward:
+            self.current += 1
+        else:
+            self.current -= 1
+        self.current %= len(self.matches)
+        return self.matches[self.current]
+    
+    def in_range(self, first, last):
+        """Return the matches on absolute lines first..last inclusive."""
+        start = bisect_left(self.matches, (first,))
+        end = bisect_left(self.matches, (last + 1,))
+        return self.matches[start:end]
@@ -0,0 +1,520 @@
+"""Headless serial session core shared by the GUI and the command line.
+
+Nothing here imports tkinter. A SerialSession owns the port, the reader
+thread, the writer thread, raw capture and auto-reconnect, and reports
+everything through callbacks that are invoked from background threads:
+
+    on_lines(messages)          list of (text, message_type) for display
+    on_chunk(data)              raw bytes exactly as received
+    on_message(text, type)      status and error messages ("system"/"error")
+    on_state(connected)         after the port was opened or closed
+
+A running ScriptRunner attached as session.script sees every decoded line
+(before filtering) with the time its chunk was read; a running Upload
+attached as session.transfer sees the raw data and the decoded lines.
+"""
+import os
+import re
+import selectors
+import sys
+import threading
+import time
+
+import serial
+
+from capture import RX
+from filters import RuleSet, parse_rule, WAIT_RULE_SOURCE
+from framing import make_framer, decode_line, hex_dump
+from reconnect import ReconnectScheduler, find_matching_port, port_identity
+from shmport import ProcessPort, DEFAULT_RING_SIZE
+from writer import SerialWriter, SendItem, DEFAULT_COMMAND_DELAY, DEFAULT_WRITE_TIMEOUT
+
+FLOW_CONTROL = ("None", "RTS/CTS", "XON/XOFF")
+READ_TIMEOUT = 0.1
+
+
+def parse_commands(text):
+    """Split ;-separated input into SendItems; raises ValueError on bad hex."""
+    items = []
+    for message in text.split(';'):
+        message = message.strip()  # Remove leading/trailing spaces from each command
+        if not message: # Skip empty strings that happen from ;;
+            continue
+        # Check if the message is a hex string
+        if message.startswith(('0x', '0X')):
+            try:
+                # Remove 0x prefix and spaces
+                data = bytes.fromhex(message[2:].replace(' ', ''))
+            except ValueError as e:
+                raise ValueError(f"Invalid hex format: {str(e)}") from None
+            items.append(SendItem(data, f"[HEX] {data.hex(' ').upper()}"))
+        else:
+            # Normal text message
+            items.append(SendItem(f"{message}\n".encode(), message))
+    return items
+
+
+class ReaderPool:
+    """Service the reads of many sessions from one thread with a selector.
+
+    Only available where serial ports expose a selectable file descriptor
+    (POSIX); sessions fall back to their own reader thread otherwise.
+    """
+
+    def __init__(self):
+        self.selector = selectors.DefaultSelector()
+        self.wake_r, self.wake_w = os.pipe()
+        os.set_blocking(self.wake_r, False)
+        self.selector.register(self.wake_r, selectors.EVENT_READ, None)
+        self.changes = []
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    @staticmethod
+    def supports(port):
+        return not sys.platform.startswith('win') and hasattr(port, 'fileno')
+
+    def add(self, session, port):
+        """Start delivering readiness of port to session.read_ready()."""
+        self.change(('add', session, port, port.fileno()))
+
+    def remove(self, port):
+        """Stop watching port (call before closing it)."""
+        self.change(('remove', None, port, port.fileno()))
+
+    def change(self, change):
+        with self.lock:
+            self.changes.append(change)
+        os.write(self.wake_w, b"\0")
+
+    def apply_changes(self):
+        """Apply queued add/remove requests on the pool thread, in order."""
+        try:
+            while os.read(self.wake_r, 4096):
+                pass
+        except BlockingIOError:
+            pass
+        with self.lock:
+            changes, self.changes = self.changes, []
+        for action, session, port, fd in changes:
+            try:
+                if action == 'add':
+                    self.selector.register(fd, selectors.EVENT_READ, (session, port))
+                elif self.selector.get_key(fd).data[1] is port:
+                    self.selector.unregister(fd)
+            except (KeyError, ValueError, OSError):
+                pass
+
+    def run(self):
+        while True:
+            for key, events in self.selector.select():
+                if key.data is None:
+                    self.apply_changes()
+                    continue
+                session, port = key.data
+                if not session.read_ready(port):
+                    try:
+                        self.selector.unregister(key.fd)
+                    except (KeyError, ValueError):
+                        pass
+
+
+class SerialSession:
+    """One serial connection with reading, decoding, filtering, sending and capture."""
+
+    def __init__(self, port_watcher=None, reader_pool=None):
+        self.port_watcher = port_watcher
+        self.reader_pool = reader_pool
+        self.serial_port = None
+        self.writer = None
+        self.is_connected = False
+        self.device = None
+        self.label = None
+        self.baud = None
+        self.flow = "None"
+        self.identity = None
+        self.capture = None
+        self.filter_wait = False
+        self.user_rules = []
+        self.rules = RuleSet([])
+        self.framing = "lines"
+        self.hex_view = False
+        self.framer = None
+        self.telemetry = None
+        self.metrics = None
+        self.script = None
+        self.transfer = None
+        self.auto_reconnect = False
+        self.capture_process = False  # Read through a separate process and shared-memory ring
+        self.ring_size = DEFAULT_RING_SIZE
+        self.delay = DEFAULT_COMMAND_DELAY
+        self.prompt = None
+        self.partial_line = 0  # Counts the framer's unterminated lines, for prompt marks
+        self.lock = threading.RLock()  # Serialises open/close across threads
+        self.reconnector = ReconnectScheduler(self.find_reconnect_port, self.attempt_reconnect)
+
+        self.on_lines = None
+        self.on_chunk = None
+        self.on_message = None
+        self.on_state = None
+
+    def message(self, text, message_type="system"):
+        if self.on_message:
+            self.on_message(text, message_type)
+
+    def open(self, device, baud, flow="None", identity=None, label=None):
+        """Open device and start the reader; raises on failure.
+
+        identity is the (vid, pid, serial_number) used for auto-reconnect; it
+        is looked up in the port watcher snapshot when not given.
+        """
+        with self.lock:
+            if self.is_connected:
+                self.close(reconnect=False)
+            if identity is None and self.port_watcher:
+                for info in self.port_watcher.snapshot.values():
+                    if info['device'] == device:
+                        identity = port_identity(info)
+                        break
+            self.device = device
+            self.label = label or device
+            self.baud = baud
+            self.flow = flow
+            self.identity = identity
+
+            if self.capture_process:
+                self.serial_port = ProcessPort(device, baud, flow, timeout=READ_TIMEOUT,
+                                               write_timeout=DEFAULT_WRITE_TIMEOUT,
+                                               ring_size=self.ring_size, on_overrun=self.on_overrun)
+            else:
+                self.serial_port = serial.Serial(device, baud, timeout=READ_TIMEOUT,
+                                                 write_timeout=DEFAULT_WRITE_TIMEOUT,
+                                                 rtscts=flow == "RTS/CTS",
+                                                 xonxoff=flow == "XON/XOFF")
+            self.writer = SerialWriter(self.serial_port, self.on_send_done,
+                                       delay=self.delay, prompt=self.prompt)
+            self.writer.capture = self.capture
+            self.writer.metrics = self.metrics
+            self.framer = make_framer(self.framing)
+            self.is_connected = True
+            self.message(f"Connected to {self.label} at {baud} baud"
+                         + (" (capture process)" if self.capture_process else ""))
+
+            if self.reader_pool and self.reader_pool.supports(self.serial_port):
+                self.reader_pool.add(self, self.serial_port)
+            else:
+                # Start reading thread
+                self.read_thread = threading.Thread(target=self.read_loop,
+                                                    args=(self.serial_port,), daemon=True)
+                self.read_thread.start()
+        if self.on_state:
+            self.on_state(True)
+
+    def close(self, reconnect=True):
+        """Close the port; with reconnect, hand the device to the reconnect scheduler."""
+        with self.lock:
+            was_connected = self.is_connected
+            self.is_connected = False
+            if self.writer:
+                self.writer.stop()
+                self.writer = None
+            port = self.serial_port
+            if port:
+                self.serial_port = None
+                if self.reader_pool:
+                    self.reader_pool.remove(port)
+                port.close()
+        if was_connected:
+            self.message("Disconnected")
+            if self.on_state:
+                self.on_state(False)
+        # Start reconnection if auto-reconnect is enabled
+        if reconnect and self.auto_reconnect and self.identity:
+            self.start_reconnect()
+
+    def shutdown(self):
+        """Stop reconnecting and close the port for good."""
+        self.auto_reconnect = False
+        self.reconnector.stop()
+        self.close(reconnect=False)
+
+    def read_loop(self, port):
+        """Read data from serial port in bulk chunks (dedicated reader thread)."""
+        while self.read_ready(port):
+            pass
+
+    def read_ready(self, port):
+        """Pull everything buffered on port; return False once reading should stop.
+
+        Called in a loop by the session's own reader thread, or by the
+        reader pool whenever the port's descriptor is readable.
+        """
+        if not self.is_connected or self.serial_port is not port:
+            return False
+        metrics = self.metrics
+        try:
+            # Blocks in select() for up to the port timeout when idle, then
+            # pulls everything the driver has buffered in one call.
+            if metrics:
+                started = time.perf_counter()
+                data = port.read(port.in_waiting or 1)
+                metrics.add("reader_iterations")
+                if not data:
+                    metrics.add("reader_idle_ms", (time.perf_counter() - started) * 1000)
+            else:
+                data = port.read(port.in_waiting or 1)
+        except Exception as e:
+            if self.is_connected and self.serial_port is port:
+                self.message(f"Read error: {str(e)}", "error")
+                framer = self.framer
+                partial = framer.flush()
+                if partial:
+                    self.queue_received([partial], framer.binary)
+                self.close()
+            return False
+
+        if data:
+            # Read timestamp for script expect latencies
+            received_at = time.perf_counter() if self.script else None
+            capture = self.capture
+            if capture:
+                capture.write(RX, data)
+            if self.on_chunk:
+                self.on_chunk(data)
+            transfer = self.transfer
+            if transfer:
+                transfer.notify_data(data)
+            framer = self.framer
+            if metrics:
+                metrics.add("rx_bytes", len(data))
+                started = time.perf_counter()
+                frames = framer.feed(data)
+                self.queue_received(frames, framer.binary, received_at)
+                metrics.observe("decode_time", time.perf_counter() - started)
+            else:
+                frames = framer.feed(data)
+                self.queue_received(frames, framer.binary, received_at)
+            if not framer.binary and not self.hex_view:
+                self.notify_partial(framer, bool(frames))
+        return True
+
+    def on_overrun(self, dropped, count):
+        """Called by a ProcessPort at the point where its ring overflowed."""
+        self.message(f"Overrun: capture ring full, {dropped} bytes dropped", "error")
+        metrics = self.metrics
+        if metrics:
+            metrics.add("rx_overrun_bytes", dropped)
+            metrics.add("rx_overruns", count)
+
+    def ring_stats(self):
+        """Return the capture ring's fill and overrun totals, or None without a capture process."""
+        port = self.serial_port
+        return port.stats() if isinstance(port, ProcessPort) else None
+
+    def queue_received(self, frames, binary=False, received_at=None):
+        """Decode and filter received frames, then pass them to on_lines."""
+        if binary or self.hex_view:
+            texts = [row for frame in frames for row in hex_dump(frame)]
+        else:
+            texts = [text for text in map(decode_line, frames) if text]
+            telemetry = self.telemetry
+            if telemetry:
+                # Before filtering, so telemetry lines can be hidden yet still plotted
+                telemetry.feed(texts)
+        script = self.script
+        if script:
+            script.notify_lines(texts, received_at or time.perf_counter())
+        transfer = self.transfer
+        if transfer:
+            transfer.notify_lines(texts)
+        writer = self.writer
+        if writer:
+            # Before filtering, so a hidden prompt line still paces the writer
+            writer.notify_lines(texts)
+        messages = self.rules.apply(texts)
+        metrics = self.metrics
+        if metrics:
+            metrics.add("rx_lines", len(texts))
+            metrics.add("filtered_lines", len(texts) - len(messages))
+        if messages and self.on_lines:
+            self.on_lines(messages)
+
+    def notify_partial(self, framer, completed):
+        """Offer the framer's unterminated line to prompt pacing and upload acks.
+
+        Prompts such as "> " usually come without a newline, so they would
+        otherwise only be seen once the next line completed them. completed
+        is True when the chunk finished a line, so the partial one is new.
+        The writer is only shown what arrived after its write started, so
+        an earlier prompt still in the line does not release it again.
+        """
+        if completed:
+            self.partial_line += 1
+        writer = self.writer
+        waiting = False
+        if writer:
+            writer.partial_state = (self.partial_line, len(framer.buffer))
+            waiting = writer.waiting_for_prompt
+        transfer = self.transfer
+        if not (waiting or transfer):
+            return
+        partial = framer.partial()
+        if waiting:
+            line, length = writer.prompt_mark
+            text = decode_line(partial[length:] if line == self.partial_line else partial)
+            if text:
+                writer.notify_lines([text])
+        if transfer:
+            text = decode_line(partial)
+            if text:
+                transfer.notify_partial(text)
+
+    def set_rules(self, rules=None, filter_wait=None):
+        """Compile the filter rules and swap them in atomically.
+
+        rules is a list of FilterRule (None keeps the current ones);
+        filter_wait adds the built-in rule dropping lines equal to "wait".
+        Raises ValueError if a pattern does not compile.
+        """
+        user_rules = self.user_rules if rules is None else list(rules)
+        if filter_wait is None:
+            filter_wait = self.filter_wait
+        active = list(user_rules)
+        if filter_wait:
+            active.append(parse_rule(WAIT_RULE_SOURCE))
+        compiled = RuleSet(active, self.rules.counters)
+        self.user_rules = user_rules
+        self.filter_wait = filter_wait
+        self.rules = compiled
+
+    def set_framing(self, framing=None, hex_view=None):
+        """Select how received bytes are framed and whether to show a hex dump.
+
+        framing is a make_framer() spec such as "lines", "cobs" or
+        "length:2:big" (None keeps the current one); raises ValueError if it
+        is invalid. A new framer takes effect immediately on an open port.
+        """
+        if hex_view is not None:
+            self.hex_view = hex_view
+        if framing is None or framing == self.framing:
+            return
+        framer = make_framer(framing)
+        self.framing = framing
+        if self.framer is not None:
+            self.framer = framer
+
+    def set_metrics(self, metrics):
+        """Attach (or detach with None) a Metrics collector."""
+        self.metrics = metrics
+        writer = self.writer
+        if writer:
+            writer.metrics = metrics
+
+    def set_pacing(self, delay, prompt):
+        """Set the inter-command delay (seconds) and prompt pattern (str or None).
+
+        Raises re.error for an invalid prompt pattern.
+        """
+        self.prompt = re.compile(prompt) if prompt else None
+        self.delay = max(delay, 0)
+        writer = self.writer
+        if writer:
+            writer.delay = self.delay
+            writer.prompt = self.prompt
+
+    def send(self, items):
+        """Queue SendItems for the writer; return False if not connected or full."""
+        writer = self.writer
+        if not self.is_connected or writer is None:
+            return False
+        return writer.submit(items)
+
+    def send_text(self, text):
+        """Parse ;-separated commands and queue them (raises ValueError on bad hex)."""
+        items = parse_commands(text)
+        if not items:
+            return True
+        return self.send(items)
+
+    def cancel_sends(self):
+        """Drop any queued sends and abort the one in progress."""
+        writer = self.writer
+        if writer:
+            writer.cancel()
+
+    def remove_sends(self, match, reason="Cancelled"):
+        """Drop the queued sends for which match(item) is true, e.g. one upload's chunks."""
+        writer = self.writer
+        if writer:
+            writer.remove(match, reason)
+
+    def on_send_done(self, item, error):
+        """Echo a completed or failed send (called from the writer thread)."""
+        if item.label is None:
+            return  # Unechoed bulk data; its sender reports errors itself
+        if error:
+            self.message(f"{error}: {item.label}", "error")
+        elif self.on_lines:
+            self.on_lines([(item.label, "sent")])
+
+    def pending_sends(self):
+        writer = self.writer
+        return writer.pending() if writer else 0
+
+    def set_capture(self, capture):
+        """Attach (or detach with None) a CaptureWriter for rx/tx traffic."""
+        if capture:
+            capture.on_error = self.on_capture_error
+        self.capture = capture
+        writer = self.writer
+        if writer:
+            writer.capture = capture
+
+    def on_capture_error(self, capture):
+        """Detach a capture that hit a disk error (called from the thread that hit it)."""
+        if self.capture is capture:
+            self.set_capture(None)
+        self.message(f"Capture stopped after {capture.bytes_written} bytes: {capture.error}", "error")
+
+    def start_reconnect(self):
+        """Hand the lost device over to the reconnect scheduler."""
+        self.message("Waiting for device to reconnect...")
+        self.reconnector.start(self.identity)
+
+    def stop_reconnect(self):
+        self.reconnector.stop()
+
+    def notify_hotplug(self):
+        """Tell the reconnect scheduler that a port just appeared."""
+        self.reconnector.notify_hotplug()
+
+    def find_reconnect_port(self, identity):
+        """Look up the target device in the current port snapshot (any thread)."""
+        if self.port_watcher is None:
+            return None
+        return find_matching_port(self.port_watcher.snapshot, identity)
+
+    def attempt_reconnect(self, key):
+        """Attempt to reopen the device found under key (called by the scheduler)."""
+        if self.is_connected or not self.auto_reconnect:
+            self.reconnector.stop()
+            return
+        info = self.port_watcher.snapshot.get(key)
+        metrics = self.metrics
+        if metrics:
+            metrics.add("reconnect_attempts")
+        success = False
+        if info:
+            try:
+                self.open(info['device'], self.baud, self.flow, port_identity(info), label=key)
+                success = True
+            except Exception as e:
+                self.message(f"Connection error: {str(e)}", "error")
+        latency = self.reconnector.attempt_finished(success)
+        if latency is not None:
+            if metrics:
+                metrics.add("reconnects")
+                metrics.observe("reconnect_latency", latency)
+            self.message(f"Reconnected after {latency * 1000:.0f} ms "
+                         f"({self.reconnector.attempts} attempts)")
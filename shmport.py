@@ -0,0 +1,315 @@
+"""Serial port read by a separate capture process into a shared-memory ring.
+
+At multi-megabit rates the reader thread can fall behind while the same
+process decodes, filters and draws, and the driver buffer overflows. In
+capture process mode a child process does nothing but read the port into
+a multiprocessing.shared_memory ring; the session consumes the ring at its
+own pace through a ProcessPort, which looks like a serial.Serial to it.
+
+The ring has one producer and one consumer, so no lock is needed: only the
+child stores the write index and only the session stores the read index,
+each as an aligned 64-bit word published after the data it covers. When
+the ring is full the child drops the rest of the chunk and counts it, and
+the session reports every overrun instead of losing the bytes silently.
+Only one gap is tracked: until the session has reached and reported it,
+the child drops all new data into that same gap, so a second overrun can
+never be reported at the wrong place in the stream.
+Writes are handed to the child over a pipe and written from its own thread.
+"""
+import multiprocessing
+import signal
+import threading
+import time
+from multiprocessing import shared_memory
+
+DEFAULT_RING_SIZE = 16 * 1024 * 1024  # About 1.3 s at 12 Mbaud
+MAX_READ = 64 * 1024  # Largest chunk handed to the decoder at once, bounding latency
+OPEN_TIMEOUT = 10.0
+POLL_MIN = 0.0005  # Consumer backoff while the ring is empty
+POLL_MAX = 0.01
+
+# Header words (8 bytes each). The two indices sit on separate cache lines;
+# both only ever grow, so fill level is write - read.
+WRITE_INDEX = 0
+READ_INDEX = 8
+OVERRUN_BYTES = 16
+OVERRUNS = 17
+HIGH_WATER = 18
+GAP_AT = 19  # Write index of the pending overrun
+REPORTED_BYTES = 20  # OVERRUN_BYTES as of the consumer's last report
+STATE = 24  # Set by the consumer to stop, by the child when it exits
+ERROR_OFFSET = 256
+ERROR_SIZE = 256
+HEADER_SIZE = 512
+
+RUNNING = 0
+STOPPING = 1
+EXITED = 2
+
+
+def attach(name):
+    """Attach to an existing segment without registering it for cleanup."""
+    try:
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError:  # Python < 3.13 has no track argument
+        return shared_memory.SharedMemory(name)
+
+
+class SharedRing:
+    """Single-producer, single-consumer byte ring in shared memory."""
+
+    def __init__(self, size=DEFAULT_RING_SIZE, name=None):
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=HEADER_SIZE + size)
+            self.shm.buf[:HEADER_SIZE] = bytes(HEADER_SIZE)
+        else:
+            self.shm = attach(name)
+        self.name = self.shm.name
+        self.header = self.shm.buf[:HEADER_SIZE].cast("Q")
+        self.data = self.shm.buf[HEADER_SIZE:]
+        self.capacity = len(self.data)
+
+    # Producer side (capture process)
+
+    def write(self, chunk):
+        """Copy as much of chunk as fits; count the rest as an overrun."""
+        header = self.header
+        if header[OVERRUN_BYTES] != header[REPORTED_BYTES]:
+            # The consumer has not reached the pending gap yet; widen it
+            # rather than start a second one further on
+            header[OVERRUN_BYTES] += len(chunk)
+            return
+        write = header[WRITE_INDEX]
+        used = write - header[READ_INDEX]
+        size = min(len(chunk), self.capacity - used)
+        if size < len(chunk):
+            header[GAP_AT] = write + size
+            header[OVERRUN_BYTES] += len(chunk) - size
+            header[OVERRUNS] += 1
+        if size:
+            start = write % self.capacity
+            first = min(size, self.capacity - start)
+            self.data[start:start + first] = chunk[:first]
+            if first < size:
+                self.data[:size - first] = chunk[first:size]
+            # Publish only after the bytes are in place
+            header[WRITE_INDEX] = write + size
+            if used + size > header[HIGH_WATER]:
+                header[HIGH_WATER] = used + size
+
+    def set_error(self, text):
+        encoded = text.encode("utf-8", "replace")[:ERROR_SIZE - 1]
+        self.shm.buf[ERROR_OFFSET:ERROR_OFFSET + len(encoded) + 1] = encoded + b"\0"
+
+    # Consumer side (session)
+
+    def available(self):
+        header = self.header
+        return header[WRITE_INDEX] - header[READ_INDEX]
+
+    def read(self, size):
+        """Return up to size buffered bytes (possibly none)."""
+        header = self.header
+        read = header[READ_INDEX]
+        size = min(size, header[WRITE_INDEX] - read)
+        if size <= 0:
+            return b""
+        start = read % self.capacity
+        first = min(size, self.capacity - start)
+        if first < size:
+            data = bytes(self.data[start:]) + bytes(self.data[:size - first])
+        else:
+            data = bytes(self.data[start:start + size])
+        # Release the space only after the bytes are copied out
+        header[READ_INDEX] = read + size
+        return data
+
+    def error(self):
+        raw = bytes(self.shm.buf[ERROR_OFFSET:ERROR_OFFSET + ERROR_SIZE])
+        return raw.split(b"\0", 1)[0].decode("utf-8", "replace")
+
+    def close(self, unlink=False):
+        self.header.release()
+        self.data.release()
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+def run_capture(device, baud, flow, timeout, write_timeout, ring_name, conn):
+    """Capture process: read device into the ring until told to stop."""
+    import serial
+
+    # Ctrl+C is for the parent, which stops the child through the ring
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    ring = SharedRing(name=ring_name)
+    try:
+        try:
+            port = serial.Serial(device, baud, timeout=timeout, write_timeout=write_timeout,
+                                 rtscts=flow == "RTS/CTS", xonxoff=flow == "XON/XOFF")
+        except Exception as e:
+            conn.send(str(e))
+            return
+        conn.send(None)
+        threading.Thread(target=serve_writes, args=(port, conn), daemon=True).start()
+        header = ring.header
+        try:
+            while header[STATE] == RUNNING:
+                data = port.read(port.in_waiting or 1)
+                if data:
+                    ring.write(data)
+        except Exception as e:
+            ring.set_error(str(e) or type(e).__name__)
+        finally:
+            port.close()
+    finally:
+        ring.header[STATE] = EXITED
+        ring.close()
+
+
+def serve_writes(port, conn):
+    """Capture process thread: write each request and reply with None or an error."""
+    while True:
+        try:
+            data = conn.recv_bytes()
+        except (EOFError, OSError):
+            return
+        try:
+            port.write(data)
+            reply = None
+        except Exception as e:
+            reply = str(e) or type(e).__name__
+        try:
+            conn.send(reply)
+        except OSError:
+            return
+
+
+class ProcessPort:
+    """The parts of serial.Serial a SerialSession uses, backed by a capture process.
+
+    There is no fileno(), so sessions read it from their own thread rather
+    than through a ReaderPool.
+
+    on_overrun(byte_count, overrun_count) is called from read() when it
+    reaches the point in the stream where the capture process dropped data.
+    """
+
+    def __init__(self, device, baud, flow="None", timeout=0.1, write_timeout=None,
+                 ring_size=DEFAULT_RING_SIZE, on_overrun=None):
+        self.timeout = timeout
+        self.write_timeout = write_timeout
+        self.on_overrun = on_overrun
+        self.ring = SharedRing(ring_size)
+        self.lock = threading.Lock()  # Keeps close() from releasing the ring under a read
+        self.write_lock = threading.Lock()
+        self.closed = False
+        self.overrun_bytes = 0
+        self.overruns = 0
+        # Spawned, not forked: the parent has Tk and several threads running
+        context = multiprocessing.get_context("spawn")
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=run_capture, daemon=True,
+                                       args=(device, baud, flow, timeout, write_timeout,
+                                             self.ring.name, child_conn))
+        try:
+            self.process.start()
+            child_conn.close()
+            if not self.conn.poll(OPEN_TIMEOUT):
+                raise OSError("Capture process did not start")
+            try:
+                error = self.conn.recv()
+            except EOFError:
+                raise OSError(f"Capture process exited with code {self.process.exitcode}") from None
+            if error:
+                raise OSError(error)
+        except BaseException:
+            self.close()
+            raise
+
+    @property
+    def in_waiting(self):
+        with self.lock:
+            if self.closed:
+                return 0
+            return min(self.ring.available(), MAX_READ)
+
+    def read(self, size=1):
+        """Return up to size bytes, waiting up to timeout for the first one."""
+        deadline = time.monotonic() + self.timeout
+        delay = POLL_MIN
+        while True:
+            with self.lock:
+                if self.closed:
+                    raise OSError("Port is closed")
+                ring = self.ring
+                header = ring.header
+                if header[OVERRUN_BYTES] != self.overrun_bytes:
+                    # Deliver the bytes before the gap, then report it
+                    before_gap = header[GAP_AT] - header[READ_INDEX]
+                    if before_gap > 0:
+                        size = min(size, before_gap)
+                    else:
+                        total = header[OVERRUN_BYTES]
+                        self.report_overrun(total, header[OVERRUNS])
+                        # Lets the child resume writing after the gap
+                        header[REPORTED_BYTES] = total
+                data = ring.read(size)
+                if data:
+                    return data
+                if header[STATE] == EXITED:
+                    raise OSError(ring.error() or "Capture process exited")
+            if not self.process.is_alive():
+                raise OSError(f"Capture process exited with code {self.process.exitcode}")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return b""
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, POLL_MAX)
+
+    def report_overrun(self, total_bytes, total_overruns):
+        dropped = total_bytes - self.overrun_bytes
+        count = total_overruns - self.overruns
+        self.overrun_bytes = total_bytes
+        self.overruns = total_overruns
+        if self.on_overrun:
+            self.on_overrun(dropped, count)
+
+    def stats(self):
+        """Return the ring fill, its high-water mark and the overrun totals."""
+        with self.lock:
+            if self.closed:
+                return None
+            header = self.ring.header
+            return {"capacity": self.ring.capacity, "used": self.ring.available(),
+                    "high_water": header[HIGH_WATER],
+                    "overrun_bytes": header[OVERRUN_BYTES], "overruns": header[OVERRUNS]}
+
+    def write(self, data):
+        with self.write_lock:
+            if self.closed:
+                raise OSError("Port is closed")
+            self.conn.send_bytes(bytes(data))
+            # The child enforces write_timeout; allow for the round trip on top
+            if not self.conn.poll((self.write_timeout or OPEN_TIMEOUT) + 1.0):
+                raise OSError("Capture process did not complete the write")
+            error = self.conn.recv()
+        if error:
+            raise OSError(error)
+        return len(data)
+
+    def close(self):
+        """Stop the capture process and free the ring."""
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            self.ring.header[STATE] = STOPPING
+        self.conn.close()
+        if self.process.pid is not None:
+            # The child checks the stop flag at least once per read timeout
+            self.process.join(self.timeout + 2.0)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join()
+        self.ring.close(unlink=True)
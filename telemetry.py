@@ -0,0 +1,153 @@
+"""Numeric telemetry extracted from received lines into fixed-size NumPy rings.
+
+A Telemetry parser is fed the decoded lines in the reader thread. Every
+line with at least one numeric field becomes one sample row; fields a line
+does not carry are NaN. Specs:
+
+    kv              every key=value pair, channels added as keys appear
+    kv:v,i          only the listed keys
+    csv             comma-separated numbers, channels named c0, c1, ...
+    csv:t,v,i       comma-separated numbers with the given channel names;
+                    fields beyond the listed names are ignored
+
+The ring is allocated once, so memory stays constant however long the
+device streams. window() returns min/max envelopes decimated to a given
+number of columns for plotting.
+"""
+import math
+import re
+import threading
+import time
+
+import numpy as np
+
+DEFAULT_CAPACITY = 1 << 18  # Samples kept per channel
+MAX_CHANNELS = 8
+
+KV_PATTERN = re.compile(r"([A-Za-z_][\w.]*)\s*=\s*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)")
+
+
+class Telemetry:
+    """Parse numeric fields from lines into a preallocated sample ring."""
+
+    def __init__(self, spec="kv", capacity=DEFAULT_CAPACITY, max_channels=MAX_CHANNELS):
+        mode, _, names = (spec or "kv").strip().partition(":")
+        mode = mode.lower()
+        if mode not in ("kv", "csv"):
+            raise ValueError(f"Unknown telemetry format: {mode} (use kv or csv)")
+        names = [name.strip() for name in names.split(",") if name.strip()]
+        if len(names) > max_channels:
+            raise ValueError(f"At most {max_channels} telemetry channels are supported")
+        self.spec = spec
+        self.mode = mode
+        self.fixed = bool(names)  # Ignore kv keys or csv fields that are not listed
+        self.names = names
+        self.columns = {name: index for index, name in enumerate(names)}
+        self.max_channels = max_channels
+        self.capacity = capacity
+        self.values = np.full((capacity, max_channels), np.nan)
+        self.times = np.zeros(capacity)
+        self.count = 0  # Total samples ever written; the ring index is count % capacity
+        self.skipped = 0
+        self.lock = threading.Lock()
+
+    def channel(self, name):
+        """Return the column for a kv key, adding it while there is room."""
+        column = self.columns.get(name)
+        if column is None and not self.fixed and len(self.names) < self.max_channels:
+            column = len(self.names)
+            self.names.append(name)
+            self.columns[name] = column
+        return column
+
+    def parse(self, texts):
+        """Return sample rows (lists of column, value pairs) for the numeric lines."""
+        rows = []
+        if self.mode == "kv":
+            findall = KV_PATTERN.findall
+            channel = self.channel
+            for text in texts:
+                row = []
+                for name, value in findall(text):
+                    column = channel(name)
+                    if column is not None:
+                        row.append((column, float(value)))
+                if row:
+                    rows.append(row)
+        else:
+            limit = len(self.names) if self.fixed else self.max_channels
+            for text in texts:
+                try:
+                    fields = [float(field) for field in text.split(",")[:limit]]
+                except ValueError:
+                    continue
+                while len(self.names) < len(fields):
+                    self.names.append(f"c{len(self.names)}")
+                rows.append(list(enumerate(fields)))
+        self.skipped += len(texts) - len(rows)
+        return rows
+
+    def feed(self, texts):
+        """Parse lines and append their samples to the ring; return the sample count."""
+        rows = self.parse(texts)
+        if not rows:
+            return 0
+        block = np.full((len(rows), self.max_channels), np.nan)
+        for index, row in enumerate(rows):
+            for column, value in row:
+                block[index, column] = value
+        self.append(block, time.monotonic())
+        return len(rows)
+
+    def append(self, block, timestamp):
+        """Copy sample rows into the ring, overwriting the oldest ones."""
+        capacity = self.capacity
+        if len(block) > capacity:
+            block = block[-capacity:]
+        count = len(block)
+        with self.lock:
+            start = self.count % capacity
+            first = min(count, capacity - start)
+            self.values[start:start + first] = block[:first]
+            self.times[start:start + first] = timestamp
+            if first < count:
+                self.values[:count - first] = block[first:]
+                self.times[:count - first] = timestamp
+            self.count += count
+
+    def clear(self):
+        with self.lock:
+            self.count = 0
+            self.values.fill(np.nan)
+
+    def latest(self, count):
+        """Return copies of the newest count (values, times), oldest first."""
+        with self.lock:
+            count = min(count, self.count, self.capacity)
+            end = self.count % self.capacity
+            if count <= end:
+                return self.values[end - count:end].copy(), self.times[end - count:end].copy()
+            wrap = count - end
+            return (np.concatenate((self.values[-wrap:], self.values[:end])),
+                    np.concatenate((self.times[-wrap:], self.times[:end])))
+
+    def window(self, count, columns):
+        """Decimate the newest count samples to at most columns min/max pairs.
+
+        Returns (names, minimums, maximums, span_seconds); the value arrays
+        have one row per output column and one column per channel.
+        """
+        values, times = self.latest(count)
+        names = list(self.names)
+        values = values[:, :len(names)]
+        if not len(values) or not names:
+            empty = np.empty((0, len(names)))
+            return names, empty, empty, 0.0
+        span = float(times[-1] - times[0])
+        bucket = max(1, math.ceil(len(values) / max(columns, 1)))
+        padding = -len(values) % bucket
+        if padding:
+            values = np.concatenate((values, np.full((padding, len(names)), np.nan)))
+        values = values.reshape(-1, bucket, len(names))
+        # fmin/fmax skip NaN without warning unless a whole bucket is NaN
+        return names, np.fmin.reduce(values, axis=1), np.fmax.reduce(values, axis=1), span
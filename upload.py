@@ -0,0 +1,322 @@
+"""Streaming file uploads with windowed, ack-paced or XMODEM/YMODEM transfer.
+
+The file is read from disk one chunk at a time and handed to the session
+writer as unpaced, unechoed SendItems, so memory use does not depend on
+the file size. Protocols:
+
+    raw       chunks of chunk_size bytes (or one line of at most chunk_size
+              bytes each with lines=True).
+              At most window chunks are in flight: written but, when an
+              ack pattern is set, not yet acknowledged by a matching line.
+    xmodem    XMODEM-CRC with 128-byte blocks (checksum if the receiver
+              starts with NAK)
+    xmodem1k  XMODEM-1K
+    ymodem    YMODEM batch transfer of the one file
+
+XMODEM and YMODEM are stop-and-wait, so the window does not apply.
+"""
+import binascii
+import os
+import re
+import threading
+import time
+from collections import deque
+
+from writer import SendItem, DEFAULT_WRITE_TIMEOUT
+
+PROTOCOLS = ("raw", "xmodem", "xmodem1k", "ymodem")
+DEFAULT_CHUNK_SIZE = 4096
+DEFAULT_WINDOW = 8
+DEFAULT_ACK_TIMEOUT = 5.0
+MIN_CHUNK_SIZE = 64
+CHUNK_SECONDS = 0.25  # Longest single write, well inside the port write timeout
+
+SOH = 0x01
+STX = 0x02
+EOT = 0x04
+ACK = 0x06
+NAK = 0x15
+CAN = 0x18
+CRC_START = ord("C")
+PAD = 0x1A
+MODEM_START_TIMEOUT = 30.0  # The receiver may need to be started by hand
+MODEM_RETRIES = 10
+
+
+class UploadError(Exception):
+    pass
+
+
+class Upload:
+    """Send one file through a SerialSession on a background thread.
+
+    on_finish(upload) is called from the upload thread when it ends;
+    upload.error is None on success.
+    """
+
+    def __init__(self, session, path, protocol="raw", chunk_size=DEFAULT_CHUNK_SIZE,
+                 window=DEFAULT_WINDOW, ack=None, lines=False,
+                 ack_timeout=DEFAULT_ACK_TIMEOUT, on_finish=None):
+        if protocol not in PROTOCOLS:
+            raise ValueError(f"Unknown upload protocol: {protocol} (choose from {', '.join(PROTOCOLS)})")
+        if chunk_size < 1 or window < 1:
+            raise ValueError("Chunk size and window must be at least 1")
+        self.session = session
+        self.path = path
+        self.protocol = protocol
+        self.chunk_size = chunk_size
+        self.window = window
+        self.ack = re.compile(ack) if ack else None
+        self.lines = lines
+        self.ack_timeout = ack_timeout
+        self.on_finish = on_finish
+        self.total = os.path.getsize(path)
+        self.bytes_sent = 0
+        self.retries = 0
+        self.started = None
+        self.elapsed = 0.0
+        self.error = None
+        self.condition = threading.Condition()
+        self.cancelled = False
+        self.submitted = 0
+        self.written = 0
+        self.acked = 0
+        # Progress through the unterminated line: how far it has been scanned
+        # and where the last ack counted in it ended
+        self.partial_scanned = 0
+        self.partial_counted = 0
+        self.write_error = None
+        self.received = deque()  # Raw received bytes for the XMODEM handshake
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def cancel(self):
+        """Stop the upload and drop its chunks still queued on the writer."""
+        with self.condition:
+            self.cancelled = True
+            self.condition.notify_all()
+        self.session.remove_sends(lambda item: item.on_done == self.on_written)
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def wait(self, timeout=None):
+        if self.thread:
+            self.thread.join(timeout)
+
+    def progress(self):
+        """Return (fraction done, bytes per second)."""
+        elapsed = (time.perf_counter() - self.started) if self.started else 0.0
+        fraction = self.bytes_sent / self.total if self.total else 1.0
+        return min(fraction, 1.0), (self.bytes_sent / elapsed if elapsed else 0.0)
+
+    # Called by the session's reader
+    def notify_data(self, data):
+        if self.protocol != "raw":
+            with self.condition:
+                self.received.extend(data)
+                self.condition.notify_all()
+
+    def notify_lines(self, texts):
+        ack = self.ack
+        if ack and texts:
+            count = sum(1 for text in texts[1:] if ack.search(text))
+            if self.partial_scanned:
+                # The first line completes the partial line seen by notify_partial()
+                count += self.count_partial(texts[0])
+                self.partial_scanned = 0
+                self.partial_counted = 0
+            elif ack.search(texts[0]):
+                count += 1
+            if count:
+                with self.condition:
+                    self.acked += count
+                    self.condition.notify_all()
+
+    def notify_partial(self, text):
+        """Count acks that arrived without a newline, e.g. "> " prompts piling up in one line."""
+        if self.ack:
+            count = self.count_partial(text)
+            if count:
+                with self.condition:
+                    self.acked += count
+                    self.condition.notify_all()
+
+    def count_partial(self, text):
+        """Count the ack matches in text that end in bytes added since the last scan."""
+        count = 0
+        for match in self.ack.finditer(text):
+            if match.start() >= self.partial_counted and match.end() > self.partial_scanned:
+                count += 1
+                self.partial_counted = match.end()
+        self.partial_scanned = len(text)
+        return count
+
+    def on_written(self, item, error):
+        with self.condition:
+            if error:
+                self.write_error = error
+            else:
+                self.written += 1
+                if self.protocol == "raw":
+                    self.bytes_sent += len(item.data)
+            self.condition.notify_all()
+
+    def run(self):
+        self.session.transfer = self
+        self.started = time.perf_counter()
+        try:
+            with open(self.path, "rb") as f:
+                if self.protocol == "raw":
+                    self.send_raw(f)
+                else:
+                    self.send_modem(f)
+        except (UploadError, OSError) as e:
+            self.error = str(e)
+        finally:
+            self.session.transfer = None
+            self.elapsed = time.perf_counter() - self.started
+        if self.on_finish:
+            self.on_finish(self)
+
+    def wait_for(self, predicate, timeout, what):
+        """Wait (holding the condition) until predicate() is true."""
+        deadline = time.monotonic() + timeout
+        while not predicate():
+            if self.cancelled:
+                raise UploadError("Cancelled")
+            if self.write_error:
+                raise UploadError(self.write_error)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise UploadError(f"Timed out waiting for {what}")
+            self.condition.wait(remaining)
+
+    def submit(self, data):
+        """Queue data on the session writer without echoing it."""
+        item = SendItem(data, None, paced=False, on_done=self.on_written)
+        while not self.session.send([item]):
+            if not self.session.is_connected:
+                raise UploadError("Not connected")
+            with self.condition:
+                # Writer queue full: give it a moment to drain
+                if self.cancelled:
+                    raise UploadError("Cancelled")
+                self.condition.wait(0.05)
+        self.submitted += 1
+
+    def chunks(self, f):
+        # Keep each write short at low baud rates (about 10 bits per byte)
+        chunk_size = self.chunk_size
+        if self.session.baud:
+            chunk_size = min(chunk_size, max(MIN_CHUNK_SIZE, int(self.session.baud / 10 * CHUNK_SECONDS)))
+        # A "line" in a file without newlines is cut at chunk_size too
+        read = f.readline if self.lines else f.read
+        while True:
+            chunk = read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def send_raw(self, f):
+        """Stream the file keeping at most window chunks unwritten or unacknowledged."""
+        done = (lambda: self.acked) if self.ack else (lambda: self.written)
+        timeout = self.ack_timeout if self.ack else DEFAULT_WRITE_TIMEOUT + 1.0
+        what = "acknowledgement" if self.ack else "write"
+        for chunk in self.chunks(f):
+            with self.condition:
+                self.wait_for(lambda: self.submitted - done() < self.window, timeout, what)
+            self.submit(chunk)
+        with self.condition:
+            self.wait_for(lambda: done() >= self.submitted, timeout, what)
+
+    # XMODEM / YMODEM
+
+    def read_control(self, timeout):
+        """Return the next byte from the receiver, or None after timeout seconds."""
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while not self.received:
+                if self.cancelled:
+                    raise UploadError("Cancelled")
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self.condition.wait(remaining)
+            return self.received.popleft()
+
+    def write_and_wait(self, data):
+        """Write one packet and wait until the writer has sent it."""
+        with self.condition:
+            self.received.clear()
+            target = self.written + 1
+        self.submit(data)
+        with self.condition:
+            self.wait_for(lambda: self.written >= target, DEFAULT_WRITE_TIMEOUT + 1.0, "write")
+
+    def wait_for_start(self):
+        """Wait for the receiver's C (CRC mode) or NAK (checksum mode)."""
+        deadline = time.monotonic() + MODEM_START_TIMEOUT
+        while True:
+            byte = self.read_control(deadline - time.monotonic())
+            if byte is None:
+                raise UploadError("Receiver did not start")
+            if byte in (CRC_START, NAK):
+                return byte == CRC_START
+            if byte == CAN:
+                raise UploadError("Cancelled by receiver")
+
+    def packet(self, number, data, size, crc):
+        data = data.ljust(size, bytes([PAD]))
+        header = bytes([SOH if size == 128 else STX, number & 0xFF, 0xFF - (number & 0xFF)])
+        if crc:
+            return header + data + binascii.crc_hqx(data, 0).to_bytes(2, "big")
+        return header + data + bytes([sum(data) & 0xFF])
+
+    def send_packet(self, packet):
+        """Send a packet until it is ACKed; NAK or silence resends it."""
+        for _ in range(MODEM_RETRIES):
+            self.write_and_wait(packet)
+            byte = self.read_control(self.ack_timeout)
+            if byte == ACK:
+                return
+            if byte == CAN:
+                raise UploadError("Cancelled by receiver")
+            self.retries += 1
+        raise UploadError("Too many retries")
+
+    def send_modem(self, f):
+        size = 128 if self.protocol == "xmodem" else 1024
+        crc = self.wait_for_start()
+        if self.protocol == "ymodem":
+            name = os.path.basename(self.path).encode()
+            header = name + b"\0" + str(self.total).encode() + b"\0"
+            block = 128 if len(header) <= 128 else 1024
+            self.send_packet(self.packet(0, header.ljust(block, b"\0"), block, crc))
+            crc = self.wait_for_start()
+
+        number = 1
+        while True:
+            data = f.read(size)
+            if not data:
+                break
+            # A short last block goes out as a 128-byte one where that is less padding
+            block = 128 if len(data) <= 128 else size
+            self.send_packet(self.packet(number, data, block, crc))
+            self.bytes_sent += len(data)
+            number += 1
+
+        for _ in range(MODEM_RETRIES):
+            self.write_and_wait(bytes([EOT]))
+            if self.read_control(self.ack_timeout) == ACK:
+                break
+        else:
+            raise UploadError("EOT not acknowledged")
+
+        if self.protocol == "ymodem":
+            # An empty block 0 ends the batch
+            self.wait_for_start()
+            self.send_packet(self.packet(0, bytes(128), 128, crc))
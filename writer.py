@@ -0,0 +1,175 @@
+"""Background serial writer with a bounded send queue and pacing."""
+import queue
+import threading
+import time
+
+from capture import TX
+
+SEND_QUEUE_SIZE = 1000
+DEFAULT_COMMAND_DELAY = 0.05
+DEFAULT_WRITE_TIMEOUT = 2.0
+DEFAULT_PROMPT_TIMEOUT = 2.0
+
+
+class SendItem:
+    """One queued write and the label echoed to the chat once it completes.
+    
+    Unpaced items skip the delay/prompt wait (scripts do their own pacing).
+    on_done(item, error), if given, is called once the item is written or
+    dropped; sent_at is the perf_counter() time the write started.
+    """
+    
+    __slots__ = ("data", "label", "paced", "on_done", "sent_at")
+    
+    def __init__(self, data, label, paced=True, on_done=None):
+        self.data = data
+        self.label = label
+        self.paced = paced
+        self.on_done = on_done
+        self.sent_at = None
+
+
+class SerialWriter:
+    """Drain a bounded send queue to the port from a dedicated thread.
+    
+    Between items the writer either sleeps for a fixed delay or, when a
+    prompt pattern is set, waits until the reader reports a line matching it
+    (or the prompt timeout expires). on_done(item, error) is called from the
+    writer thread for every item, with error set to a message on failure or
+    cancellation. A prompt timeout is reported as a second call for the item.
+    
+    The reader keeps partial_state set to (line number, length) of its
+    unterminated line; prompt_mark is its value when the current prompt
+    wait began, so the reader can match only text that came after it.
+    """
+    
+    def __init__(self, port, on_done, delay=DEFAULT_COMMAND_DELAY, prompt=None,
+                 prompt_timeout=DEFAULT_PROMPT_TIMEOUT):
+        self.port = port
+        self.on_done = on_done
+        self.delay = delay
+        self.prompt = prompt
+        self.prompt_timeout = prompt_timeout
+        self.queue = queue.Queue(maxsize=SEND_QUEUE_SIZE)
+        self.cancelled = threading.Event()
+        self.prompt_seen = threading.Event()
+        self.waiting_for_prompt = False
+        self.partial_state = (None, 0)
+        self.prompt_mark = (None, 0)
+        self.capture = None
+        self.metrics = None
+        self.running = True
+        self.thread = None  # Started on the first submit
+    
+    def pending(self):
+        """Return the number of items waiting to be written."""
+        return self.queue.qsize()
+    
+    def submit(self, items):
+        """Queue items without blocking; return False if the queue is full."""
+        if self.queue.maxsize - self.queue.qsize() < len(items):
+            return False
+        self.cancelled.clear()
+        for item in items:
+            self.queue.put_nowait(item)
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+        return True
+    
+    def cancel(self):
+        """Drop queued items and abort the write or wait in progress."""
+        self.cancelled.set()
+        self.prompt_seen.set()
+        cancel_write = getattr(self.port, 'cancel_write', None)
+        if cancel_write:
+            try:
+                cancel_write()
+            except Exception:
+                pass
+        self.drain("Cancelled")
+    
+    def stop(self):
+        """Cancel outstanding work and let the writer thread exit."""
+        self.running = False
+        self.cancel()
+        try:
+            self.queue.put_nowait(None)
+        except queue.Full:
+            pass
+    
+    def remove(self, match, reason):
+        """Drop the queued items for which match(item) is true, leaving the rest."""
+        with self.queue.mutex:
+            pending = self.queue.queue
+            removed = [item for item in pending if item is not None and match(item)]
+            if removed:
+                kept = [item for item in pending if item is None or not match(item)]
+                pending.clear()
+                pending.extend(kept)
+                self.queue.not_full.notify_all()
+        for item in removed:
+            self.finish(item, reason)
+    
+    def drain(self, reason):
+        """Report every queued item as not sent."""
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not None:
+                self.finish(item, reason)
+    
+    def notify_lines(self, lines):
+        """Called by the reader with decoded lines; releases a pending prompt wait."""
+        if self.waiting_for_prompt and self.prompt:
+            search = self.prompt.search
+            if any(search(line) for line in lines):
+                self.prompt_seen.set()
+    
+    def run(self):
+        """Writer thread: write each item, then pace before the next one."""
+        while self.running:
+            item = self.queue.get()
+            if item is None:
+                break
+            if self.cancelled.is_set():
+                self.finish(item, "Cancelled")
+                continue
+            
+            prompt = self.prompt if item.paced else None
+            if prompt:
+                self.prompt_seen.clear()
+                self.prompt_mark = self.partial_state
+                self.waiting_for_prompt = True
+            try:
+                item.sent_at = time.perf_counter()
+                self.port.write(item.data)
+            except Exception as e:
+                self.waiting_for_prompt = False
+                self.finish(item, f"Send error: {str(e)}")
+                # Stop if there is a send error
+                self.drain("Not sent after earlier error")
+                continue
+            capture = self.capture
+            if capture:
+                capture.write(TX, item.data)
+            metrics = self.metrics
+            if metrics:
+                metrics.add("tx_bytes", len(item.data))
+                metrics.add("tx_commands")
+            self.finish(item, None)
+            
+            if prompt:
+                if not self.prompt_seen.wait(self.prompt_timeout):
+                    self.on_done(item, f"No prompt within {self.prompt_timeout:.1f} s")
+                self.waiting_for_prompt = False
+            elif self.delay and item.paced:
+                self.cancelled.wait(self.delay)
+    
+    def finish(self, item, error):
+        """Report an item as written (error None) or dropped."""
+        self.on_done(item, error)
+        if item.on_done:
+            item.on_done(item, error)